@@ -0,0 +1,169 @@
+from itertools import chain
+import numpy as np
+from database_manager import DEFAULT_USER_ID, get_questions, list_decks
+from db_connection import get_connection
+from spaced_repetition import SECONDS_PER_DAY
+
+# Reviews are read this many rows at a time, oldest first
+LOAD_CHUNK_ROWS = 250_000
+# Retention is bucketed by days since the previous review of the same card
+RETENTION_BIN_EDGES = np.array([0, 1, 2, 4, 7, 14, 30, 60, 120, 365], dtype=float)
+HARDEST_MIN_ATTEMPTS = 3
+
+SELECT_NEW_REVIEWS_SQL = '''
+    SELECT id, question_id, deck_id, reviewed_at, correct FROM reviews
+    WHERE user_id = ? AND id > ?
+    ORDER BY id
+    LIMIT ?
+    '''
+
+def _grow(array, size, fill=0):
+    """Return `array` extended with `fill` to at least `size` elements"""
+    if len(array) >= size:
+        return array
+    grown = np.full(max(size, 2 * len(array)), fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+class ReviewAnalytics:
+    """Running aggregates over one user's review log.
+
+    refresh() reads only the reviews appended since the last call and folds
+    them into per-card, per-deck and retention counters with vectorized
+    NumPy passes, so reports cost O(cards) however long the log grows.
+    """
+
+    def __init__(self, user_id=DEFAULT_USER_ID):
+        self.user_id = user_id
+        self.last_review_id = 0
+        self.reviews = 0
+        # Indexed by question id / deck id
+        self._card_attempts = np.zeros(0, dtype=np.int64)
+        self._card_correct = np.zeros(0, dtype=np.int64)
+        self._card_last_seen = np.zeros(0, dtype=float)
+        self._deck_attempts = np.zeros(0, dtype=np.int64)
+        self._deck_correct = np.zeros(0, dtype=np.int64)
+        # Indexed by retention bin
+        self._retention_attempts = np.zeros(len(RETENTION_BIN_EDGES), dtype=np.int64)
+        self._retention_correct = np.zeros(len(RETENTION_BIN_EDGES), dtype=np.int64)
+
+    def refresh(self):
+        """Fold in reviews logged since the last refresh; returns how many were new"""
+        conn = get_connection()
+        added = 0
+        while True:
+            rows = conn.execute(SELECT_NEW_REVIEWS_SQL,
+                                (self.user_id, self.last_review_id, LOAD_CHUNK_ROWS)).fetchall()
+            if not rows:
+                return added
+            data = np.fromiter(chain.from_iterable(rows), dtype=float,
+                               count=5 * len(rows)).reshape(-1, 5)
+            self._ingest(data[:, 1].astype(np.int64), data[:, 2].astype(np.int64),
+                         data[:, 3], data[:, 4].astype(np.int64))
+            self.last_review_id = int(data[-1, 0])
+            added += len(rows)
+            self.reviews += len(rows)
+
+    def _ingest(self, question_ids, deck_ids, reviewed_at, correct):
+        """Add one chronological chunk of reviews to the running counters"""
+        cards = int(question_ids.max()) + 1
+        self._card_attempts = _grow(self._card_attempts, cards)
+        self._card_correct = _grow(self._card_correct, cards)
+        self._card_last_seen = _grow(self._card_last_seen, cards, np.nan)
+        self._card_attempts[:cards] += np.bincount(question_ids, minlength=cards)
+        self._card_correct[:cards] += np.bincount(question_ids, weights=correct, minlength=cards).astype(np.int64)
+
+        decks = int(deck_ids.max()) + 1
+        self._deck_attempts = _grow(self._deck_attempts, decks)
+        self._deck_correct = _grow(self._deck_correct, decks)
+        self._deck_attempts[:decks] += np.bincount(deck_ids, minlength=decks)
+        self._deck_correct[:decks] += np.bincount(deck_ids, weights=correct, minlength=decks).astype(np.int64)
+
+        # Group each card's reviews together, oldest first (the chunk is
+        # already in log order, which a stable sort keeps)
+        order = np.argsort(question_ids, kind='stable')
+        cards_sorted = question_ids[order]
+        times = reviewed_at[order]
+        outcomes = correct[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = cards_sorted[1:] != cards_sorted[:-1]
+        last = np.ones(len(order), dtype=bool)
+        last[:-1] = first[1:]
+
+        # The previous review is the one before it in this chunk, or the
+        # card's last review from earlier chunks (NaN if it's the first ever)
+        previous = np.empty_like(times)
+        previous[1:] = times[:-1]
+        previous[first] = self._card_last_seen[cards_sorted[first]]
+        seen_before = ~np.isnan(previous)
+        gaps = (times[seen_before] - previous[seen_before]) / SECONDS_PER_DAY
+        bins = np.digitize(gaps, RETENTION_BIN_EDGES[1:])
+        self._retention_attempts += np.bincount(bins, minlength=len(RETENTION_BIN_EDGES))
+        self._retention_correct += np.bincount(
+            bins, weights=outcomes[seen_before], minlength=len(RETENTION_BIN_EDGES)).astype(np.int64)
+
+        self._card_last_seen[cards_sorted[last]] = times[last]
+
+    # --- Reports -----------------------------------------------------------
+
+    def card_accuracy(self, min_attempts=1):
+        """Arrays of question_id, attempts, correct and accuracy for reviewed cards"""
+        question_ids = np.flatnonzero(self._card_attempts >= max(min_attempts, 1))
+        attempts = self._card_attempts[question_ids]
+        correct = self._card_correct[question_ids]
+        return {
+            'question_id': question_ids,
+            'attempts': attempts,
+            'correct': correct,
+            'accuracy': correct / attempts,
+        }
+
+    def hardest(self, limit=10, min_attempts=HARDEST_MIN_ATTEMPTS):
+        """Lowest-accuracy cards (most attempted first among ties), with their text"""
+        cards = self.card_accuracy(min_attempts)
+        order = np.lexsort((-cards['attempts'], cards['accuracy']))[:limit]
+        question_ids = cards['question_id'][order].tolist()
+        questions = get_questions(question_ids)
+        return [{
+            'id': question_id,
+            'question': questions[question_id].question if question_id in questions else None,
+            'attempts': int(cards['attempts'][i]),
+            'accuracy': float(cards['accuracy'][i]),
+        } for i, question_id in zip(order.tolist(), question_ids)]
+
+    def retention_curve(self):
+        """Share of correct answers by days since the card was last reviewed"""
+        upper = list(RETENTION_BIN_EDGES[1:]) + [None]
+        return [{
+            'min_days': float(low),
+            'max_days': None if high is None else float(high),
+            'reviews': int(attempts),
+            'retention': float(correct / attempts) if attempts else None,
+        } for low, high, attempts, correct in zip(
+            RETENTION_BIN_EDGES, upper, self._retention_attempts, self._retention_correct)]
+
+    def deck_weakness(self):
+        """Per-deck accuracy, weakest deck first; decks stand in for topics"""
+        names = {deck['id']: deck['name'] for deck in list_decks()}
+        deck_ids = np.flatnonzero(self._deck_attempts)
+        accuracy = self._deck_correct[deck_ids] / self._deck_attempts[deck_ids]
+        order = np.argsort(accuracy, kind='stable')
+        return [{
+            'deck_id': int(deck_ids[i]),
+            'name': names.get(int(deck_ids[i])),
+            'reviews': int(self._deck_attempts[deck_ids[i]]),
+            'accuracy': float(accuracy[i]),
+        } for i in order.tolist()]
+
+    def report(self, limit=10):
+        """Refresh, then every report in one dict"""
+        self.refresh()
+        attempts = int(self._card_attempts.sum())
+        return {
+            'user_id': self.user_id,
+            'reviews': self.reviews,
+            'accuracy': float(self._card_correct.sum() / attempts) if attempts else None,
+            'hardest': self.hardest(limit),
+            'retention': self.retention_curve(),
+            'decks': self.deck_weakness(),
+        }
@@ -0,0 +1,103 @@
+import re
+from dataclasses import replace
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# Bump whenever resolution changes, so stale extraction cache entries are no
+# longer hit
+RESOLVER_VERSION = 1
+
+# "The correct answer is B", "Correct option: (C)", "Option D is correct"
+ANSWER_STATEMENT_PATTERN = re.compile(r'''
+    (?i:\b(?:correct\s+(?:answer|option|choice)|answer)(?:\s+(?:is|was)\b|\s*:)\s*:?\s*(?:option\s+)?)
+        \(?([A-Z])\b
+  | (?i:\boption\s+)([A-Z])(?i:\s+is\s+(?:the\s+)?correct\b)
+    ''', re.VERBOSE)
+WORD_PATTERN = re.compile(r'[a-z0-9]+')
+# Share of an option's words that must appear in the explanation for a fuzzy
+# match, and how far ahead of the runner-up the best option must be
+FUZZY_MIN_COVERAGE = 0.75
+FUZZY_MIN_MARGIN = 0.25
+
+# How an answer was resolved
+STATED, EXPLANATION_STATEMENT, EXPLANATION_MATCH, UNRESOLVED = (
+    'stated', 'explanation_statement', 'explanation_match', 'unresolved')
+
+def _normalize(text):
+    return ' '.join(WORD_PATTERN.findall(text.lower()))
+
+def _stated_in_explanation(options, explanation):
+    for match in ANSWER_STATEMENT_PATTERN.finditer(explanation):
+        letter = match.group(1) or match.group(2)
+        if letter in options:
+            return letter
+    return None
+
+def _matched_in_explanation(options, explanation):
+    """The option the explanation talks about, or None if it's unclear.
+
+    An option whose whole text appears in the explanation wins, the earliest
+    (then longest) one if several do, since explanations lead with the right
+    answer. Otherwise the option with the best word coverage wins if it's
+    clearly ahead of the rest.
+    """
+    text = f' {_normalize(explanation)} '
+    words = set(text.split())
+    mentions = []
+    coverage = []
+    for letter, option in options.items():
+        normalized = _normalize(option)
+        if not normalized:
+            continue
+        position = text.find(f' {normalized} ')
+        if position >= 0:
+            mentions.append((position, -len(normalized), letter))
+        option_words = set(normalized.split())
+        coverage.append((len(option_words & words) / len(option_words), letter))
+    if mentions:
+        return min(mentions)[2]
+    coverage.sort(reverse=True)
+    if not coverage or coverage[0][0] < FUZZY_MIN_COVERAGE:
+        return None
+    if len(coverage) > 1 and coverage[0][0] - coverage[1][0] < FUZZY_MIN_MARGIN:
+        return None
+    return coverage[0][1]
+
+def resolve_answer(options, correct_answer, explanation):
+    """Return (answer, method) reconciling a parsed answer with the options.
+
+    The parsed answer stands if it names one of the options. Otherwise the
+    explanation is searched for a statement like "the correct answer is C",
+    then fuzzy-matched against the option texts. Returns (None, UNRESOLVED)
+    if nothing fits.
+    """
+    if correct_answer in options:
+        return correct_answer, STATED
+    explanation = explanation or ''
+    letter = _stated_in_explanation(options, explanation)
+    if letter:
+        return letter, EXPLANATION_STATEMENT
+    letter = _matched_in_explanation(options, explanation)
+    if letter:
+        return letter, EXPLANATION_MATCH
+    return None, UNRESOLVED
+
+def resolve_answers(questions):
+    """Pipeline stage: yield Questions with correct_answer resolved.
+
+    Unresolvable questions are yielded with correct_answer None, which
+    add_questions rejects. Counts per method are logged once the input is
+    exhausted.
+    """
+    counts = dict.fromkeys((STATED, EXPLANATION_STATEMENT, EXPLANATION_MATCH, UNRESOLVED), 0)
+    for question in questions:
+        answer, method = resolve_answer(question.options_dict(), question.correct_answer,
+                                        question.explanation)
+        counts[method] += 1
+        if answer != question.correct_answer:
+            logger.debug("Resolved answer %r to %r (%s) for %r", question.correct_answer,
+                         answer, method, question.question[:60])
+            question = replace(question, correct_answer=answer)
+        yield question
+    logger.info("Answer resolution: %s", ', '.join(f"{count} {method}" for method, count in counts.items()))
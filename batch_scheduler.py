@@ -0,0 +1,141 @@
+import time
+import numpy as np
+from db_connection import get_connection, transaction
+from database_manager import DEFAULT_USER_ID, _deck_filter
+from spaced_repetition import MIN_EASE, PASSING_QUALITY, QUALITY_CORRECT, SECONDS_PER_DAY
+
+STATE_FIELDS = ('question_id', 'ease', 'interval', 'repetitions', 'lapses', 'last_review', 'next_review')
+FORECAST_HORIZONS = (30, 90, 365)
+
+SELECT_STATES_SQL = '''
+    SELECT question_id, ease, interval, repetitions, lapses, last_review, next_review
+    FROM review_state {index} WHERE user_id = ? {deck_filter}
+    '''
+# Without ANALYZE statistics SQLite scans the user's whole primary-key range
+# and filters decks row by row; this index reads only the chosen decks
+DECK_STATES_INDEX = 'INDEXED BY idx_review_state_user_deck_due'
+UPDATE_STATE_SQL = '''
+    UPDATE review_state
+    SET ease = ?, interval = ?, repetitions = ?, lapses = ?, last_review = ?, next_review = ?
+    WHERE user_id = ? AND question_id = ?
+    '''
+
+def load_states(question_ids=None, user_id=DEFAULT_USER_ID, deck_ids=None):
+    """Read a user's review state for all (or the given) cards into NumPy arrays, in one query.
+
+    deck_ids limits the cards to those decks; None means every deck.
+    """
+    deck_filter, deck_params = _deck_filter(deck_ids)
+    sql = SELECT_STATES_SQL.format(index=DECK_STATES_INDEX if deck_filter else '', deck_filter=deck_filter)
+    params = [user_id, *deck_params]
+    if question_ids is not None:
+        question_ids = list(question_ids)
+        sql += f" AND question_id IN ({','.join('?' * len(question_ids))})"
+        params += question_ids
+    rows = get_connection().execute(sql, params).fetchall()
+    columns = list(zip(*rows)) if rows else [()] * len(STATE_FIELDS)
+    states = {name: np.array(column, dtype=float) for name, column in zip(STATE_FIELDS, columns)}
+    states['question_id'] = states['question_id'].astype(np.int64)
+    states['repetitions'] = states['repetitions'].astype(np.int64)
+    states['lapses'] = states['lapses'].astype(np.int64)
+    return states
+
+def save_states(states, user_id=DEFAULT_USER_ID):
+    """Write a batch of a user's card states back with a single executemany"""
+    rows = zip(
+        states['ease'].tolist(), states['interval'].tolist(),
+        states['repetitions'].tolist(), states['lapses'].tolist(),
+        states['last_review'].tolist(), states['next_review'].tolist(),
+        [user_id] * len(states['question_id']), states['question_id'].tolist(),
+    )
+    with transaction() as conn:
+        conn.executemany(UPDATE_STATE_SQL, rows)
+
+def reschedule(states, quality, now=None):
+    """Apply one SM-2 review to every card at once.
+
+    `states` is a dict of equal-length arrays as returned by load_states and
+    `quality` is a scalar or array of review grades (0-5). Mirrors
+    spaced_repetition.sm2/schedule_review element-wise and returns new arrays.
+    """
+    if now is None:
+        now = time.time()
+    ease = np.asarray(states['ease'], dtype=float)
+    interval = np.asarray(states['interval'], dtype=float)
+    repetitions = np.asarray(states['repetitions'], dtype=np.int64)
+    quality = np.broadcast_to(np.asarray(quality), ease.shape)
+    if not np.all((quality >= 0) & (quality <= 5)):
+        raise ValueError("Review quality must be between 0 and 5")
+
+    passed = quality >= PASSING_QUALITY
+    grown = np.where(repetitions == 0, 1, np.where(repetitions == 1, 6, np.maximum(1, np.round(interval * ease))))
+    new_interval = np.where(passed, grown, 1).astype(float)
+    miss = 5 - quality
+    new_ease = np.maximum(MIN_EASE, ease + 0.1 - miss * (0.08 + miss * 0.02))
+
+    return {
+        'question_id': np.asarray(states['question_id']),
+        'ease': new_ease,
+        'interval': new_interval,
+        'repetitions': np.where(passed, repetitions + 1, 0),
+        'lapses': np.asarray(states['lapses']) + ~passed,
+        'last_review': np.broadcast_to(np.asarray(now, dtype=float), ease.shape).copy(),
+        'next_review': now + new_interval * SECONDS_PER_DAY,
+    }
+
+def reschedule_cards(question_ids, quality, now=None, user_id=DEFAULT_USER_ID, deck_ids=None):
+    """Load, reschedule and save a user's cards: one query, one vectorized step, one bulk write.
+
+    question_ids None means every card, or every card in deck_ids when given.
+    `quality` is one grade for all of them or, with explicit question_ids,
+    one grade per id in the same order.
+    """
+    if question_ids is not None:
+        # Read twice below, so a generator must not be used up by the first pass
+        question_ids = list(question_ids)
+    if np.ndim(quality):
+        if question_ids is None:
+            raise ValueError("Per-card quality needs the matching question_ids")
+        if len(quality) != len(question_ids):
+            raise ValueError(f"Got {len(quality)} quality grades for {len(question_ids)} question ids")
+    states = load_states(question_ids, user_id, deck_ids)
+    if len(states['question_id']) == 0:
+        return states
+    if np.ndim(quality):
+        # Outcomes arrive in the caller's id order; rows come back in table order
+        by_id = dict(zip(question_ids, quality))
+        quality = np.array([by_id[qid] for qid in states['question_id'].tolist()])
+    states = reschedule(states, quality, now)
+    save_states(states, user_id)
+    return states
+
+def forecast(states, days=max(FORECAST_HORIZONS), now=None, quality=QUALITY_CORRECT):
+    """Number of reviews falling on each of the next `days` days.
+
+    Assumes every future review is answered with `quality`; overdue cards
+    count towards today.
+    """
+    if now is None:
+        now = time.time()
+    counts = np.zeros(days, dtype=np.int64)
+    horizon = now + days * SECONDS_PER_DAY
+
+    due = np.maximum(np.asarray(states['next_review'], dtype=float), now)
+    active = due < horizon
+    cards = {name: np.asarray(states[name])[active] for name in STATE_FIELDS}
+    due = due[active]
+
+    while len(due):
+        day = ((due - now) // SECONDS_PER_DAY).astype(np.int64)
+        counts += np.bincount(day, minlength=days)[:days]
+        cards = reschedule(cards, quality, due)
+        due = cards['next_review']
+        active = due < horizon
+        cards = {name: values[active] for name, values in cards.items()}
+        due = due[active]
+    return counts
+
+def forecast_workload(horizons=FORECAST_HORIZONS, now=None, user_id=DEFAULT_USER_ID, deck_ids=None):
+    """A user's daily review load for each horizon (in days), computed in a single simulation"""
+    counts = forecast(load_states(user_id=user_id, deck_ids=deck_ids), days=max(horizons), now=now)
+    return {days: counts[:days] for days in horizons}
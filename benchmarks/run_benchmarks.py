@@ -0,0 +1,156 @@
+"""End-to-end performance benchmarks.
+
+Generates synthetic exam PDFs at several sizes and times the import path
+(text extraction and parsing, bulk inserts), question lookups and a headless
+study session against a scratch database. Run from the repository root:
+
+    python -m benchmarks.run_benchmarks --output results.json
+    python -m benchmarks.run_benchmarks --sizes 100 1000 --compare results.json
+
+Results are JSON tagged with the git commit, so runs from different commits
+can be compared with --compare.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.synthetic import question_blocks, write_pdf
+
+DEFAULT_SIZES = (100, 1000, 10000)
+LOOKUPS = 2000
+STUDY_CARDS = 200
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _timed(func, ops=1, repeat=3, setup=None):
+    """Best-of-`repeat` timing of func(), which performs `ops` operations.
+
+    setup, if given, runs untimed before each repeat and its result is
+    passed to func.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        args = (setup(),) if setup else ()
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return {'seconds': best, 'ops': ops, 'us_per_op': best / ops * 1e6}
+
+def bench_size(size, workdir, repeat):
+    # Imported here so the scratch database path is set before any connection opens
+    import database_manager
+    import db_connection
+    from pdf_processor import extract_questions_from_pdf, parse_question
+    from question_cache import QuestionCache
+    from spaced_repetition import QUALITY_CORRECT, QUALITY_INCORRECT
+
+    pdf_path = os.path.join(workdir, f'exam_{size}.pdf')
+    write_pdf(pdf_path, size)
+    db_connection.set_db_path(os.path.join(workdir, f'bench_{size}.db'))
+    database_manager.init_db()
+    results = {}
+
+    questions = extract_questions_from_pdf(pdf_path, use_cache=False)
+    assert len(questions) == size, f"parsed {len(questions)} of {size} questions"
+    results['extract_questions_from_pdf'] = _timed(
+        lambda: extract_questions_from_pdf(pdf_path, use_cache=False), size, repeat)
+    results['extract_questions_from_pdf_serial'] = _timed(
+        lambda: extract_questions_from_pdf(pdf_path, workers=1, use_cache=False), size, repeat)
+
+    blocks = question_blocks(size)
+    results['parse_question'] = _timed(lambda: [parse_question(block) for block in blocks], size, repeat)
+
+    # Each repeat inserts into an empty deck; clearing the previous one isn't timed
+    results['add_questions'] = _timed(
+        lambda deck_id: database_manager.add_questions(questions, deck_id=deck_id), size, repeat,
+        setup=lambda: database_manager.add_deck('bench', replace=True))
+
+    deck_id = database_manager.get_deck_id('bench')
+    ids = [row[0] for row in db_connection.get_connection().execute(
+        "SELECT id FROM questions WHERE deck_id = ?", (deck_id,))]
+    rng = random.Random(size)
+    sample = [rng.choice(ids) for _ in range(LOOKUPS)]
+    results['get_question'] = _timed(
+        lambda: [database_manager.get_question(qid) for qid in sample], LOOKUPS, repeat)
+    results['get_total_questions'] = _timed(
+        lambda: [database_manager.get_total_questions() for _ in range(LOOKUPS)], LOOKUPS, repeat)
+    results['get_question_number'] = _timed(
+        lambda: [database_manager.get_question_number(qid) for qid in sample], LOOKUPS, repeat)
+
+    # The GUI's study loop without Tk: take the next due card, show it,
+    # grade it, record the review and prefetch while "the user reads"
+    cards = min(STUDY_CARDS, size)
+    def study_session():
+        cache = QuestionCache(deck_ids=[deck_id])
+        question_id = cache.next_due()
+        for _ in range(cards):
+            question = cache.get(question_id)
+            chosen = rng.choice(question.letters or ('A',))
+            quality = QUALITY_CORRECT if chosen == question.correct_answer else QUALITY_INCORRECT
+            database_manager.record_review(question_id, quality)
+            database_manager.get_total_questions(deck_id)
+            cache.prefetch_due(exclude=question_id)
+            question_id = cache.next_due(exclude=question_id)
+    # Runs once: reviewing cards changes what is due next time
+    results['study_session'] = _timed(study_session, cards, 1)
+
+    db_connection.close_all()
+    return results
+
+def run(sizes=DEFAULT_SIZES, repeat=3):
+    report = {
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': {},
+    }
+    with tempfile.TemporaryDirectory(prefix='sr_bench_') as workdir:
+        os.environ['EXTRACTION_CACHE_DIR'] = os.path.join(workdir, 'cache')
+        for size in sizes:
+            report['results'][str(size)] = bench_size(size, workdir, repeat)
+    return report
+
+def print_report(report, baseline=None):
+    print(f"commit {report['commit']}  python {report['python']}  {report['platform']}")
+    for size, benches in report['results'].items():
+        print(f"\n{size} questions")
+        for name, stats in benches.items():
+            line = f"  {name:36} {stats['seconds'] * 1000:>10.2f} ms  {stats['us_per_op']:>10.2f} us/op"
+            old = (baseline or {}).get('results', {}).get(size, {}).get(name)
+            if old:
+                line += f"  {old['seconds'] / stats['seconds']:>6.2f}x vs baseline"
+            print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark import, lookup and study performance")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="write the JSON report to this file")
+    parser.add_argument('--compare', help="JSON report from an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.repeat)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
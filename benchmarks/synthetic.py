@@ -0,0 +1,84 @@
+"""Deterministic synthetic exam content for the benchmarks"""
+import random
+
+LETTERS = 'ABCDE'
+TOPICS = ['firewall', 'encryption', 'logging', 'identity', 'backup', 'patching',
+          'segmentation', 'incident response', 'key management', 'phishing']
+
+def question_lines(number, rng):
+    """Lines of one "QUESTION N" block in the layout the parser expects"""
+    topic = rng.choice(TOPICS)
+    option_count = rng.choice((4, 4, 4, 5))
+    answer = LETTERS[rng.randrange(option_count)]
+    lines = [f"QUESTION {number}",
+             f"A company is reviewing its {topic} controls after audit finding {number}."]
+    if rng.random() < 0.4:
+        # Long stems wrap onto a second line
+        lines.append("Which of the following should the security team do first?")
+    for letter in LETTERS[:option_count]:
+        lines.append(f"{letter}. Apply {rng.choice(TOPICS)} measure {rng.randrange(1000)}")
+        if rng.random() < 0.15:
+            lines.append("to every production system")
+    lines.append(f"Answer: {answer}")
+    lines.append(f"Explanation: Option {answer} addresses the {topic} risk directly.")
+    for _ in range(rng.randrange(3)):
+        lines.append(f"The other options only partially cover {rng.choice(TOPICS)}.")
+    return lines
+
+def question_pages(count, lines_per_page=60, seed=0):
+    """`count` questions laid out as a list of pages, each a list of lines"""
+    rng = random.Random(seed)
+    lines = ["Practice exam", "Generated for benchmarking"]
+    for number in range(1, count + 1):
+        lines.extend(question_lines(number, rng))
+    return [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+
+def page_texts(count, lines_per_page=60, seed=0):
+    """Page texts as text extraction would return them (no trailing newline)"""
+    return ['\n'.join(page) for page in question_pages(count, lines_per_page, seed)]
+
+def question_blocks(count, seed=0):
+    """Raw "QUESTION N ..." blocks, one per question, as parse_question takes them"""
+    rng = random.Random(seed)
+    return ['\n'.join(question_lines(number, rng)) for number in range(1, count + 1)]
+
+def _pdf_string(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def write_pdf(path, count, lines_per_page=60, seed=0):
+    """Write a minimal text PDF holding `count` synthetic questions.
+
+    Each page is one content stream of Helvetica text lines, which text
+    extraction returns one per line, just like a real exam dump.
+    """
+    pages = question_pages(count, lines_per_page, seed)
+    objects = [b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    font_id = 1
+    pages_id = 2 + 2 * len(pages)
+    page_ids = []
+    for lines in pages:
+        ops = ["BT /F1 10 Tf 12 TL 40 800 Td"]
+        ops.extend(f"({_pdf_string(line)}) Tj T*" for line in lines)
+        ops.append("ET")
+        stream = '\n'.join(ops).encode('latin-1')
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 842] /Contents %d 0 R "
+                       b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, content_id, font_id))
+        page_ids.append(len(objects))
+    kids = b' '.join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects.append(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids)))
+    objects.append(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b''.join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, len(objects), xref)
+    with open(path, 'wb') as f:
+        f.write(out)
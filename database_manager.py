@@ -1,104 +1,415 @@
-import sqlite3
-import json
+import time
+import uuid
 from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+import metrics
+from db_connection import get_connection, transaction
+from migrations import migrate
+from models import Question
+from spaced_repetition import schedule_review
+from utils import get_logger
 
-def init_db():
-    conn = sqlite3.connect('questions.db')
-    cursor = conn.cursor()
-    
-    # Drop the existing table if it exists
-    cursor.execute("DROP TABLE IF EXISTS questions")
-    
-    # Create the table with the correct structure
-    cursor.execute('''
-    CREATE TABLE questions (
-        id INTEGER PRIMARY KEY,
-        question TEXT,
-        options TEXT,
-        correct_answer TEXT,
-        explanation TEXT
+logger = get_logger(__name__)
+
+DEFAULT_DECK_ID = 1
+DEFAULT_USER_ID = 1
+
+INSERT_QUESTION_SQL = '''
+    INSERT INTO questions (id, deck_id, position, question, correct_answer, explanation)
+    VALUES (?, ?, ?, ?, ?, ?)
+    '''
+INSERT_OPTION_SQL = "INSERT INTO question_options (question_id, letter, text) VALUES (?, ?, ?)"
+# Reserves a block of question ids and returns the last one; ids are never
+# reused, even after their questions are deleted (migration 11)
+RESERVE_QUESTION_IDS_SQL = "UPDATE sequences SET value = value + ? WHERE name = 'questions' RETURNING value"
+DECK_SIZE_SQL = "SELECT total FROM deck_stats WHERE deck_id = ?"
+# Not the deck's size: positions keep their gaps once questions are deleted
+MAX_POSITION_SQL = "SELECT COALESCE(MAX(position), 0) FROM questions WHERE deck_id = ?"
+
+# Questions are loaded together with their options in a single join; rows come
+# back one per option and are folded into Questions by _assemble_questions
+QUESTION_WITH_OPTIONS = '''
+    SELECT q.id, q.question, q.correct_answer, q.explanation, o.letter, o.text
+    FROM questions q LEFT JOIN question_options o ON o.question_id = q.id
+    '''
+SELECT_QUESTION_SQL = QUESTION_WITH_OPTIONS + "WHERE q.id = ? ORDER BY o.letter"
+# The due CTE is filled in per call: one user across all decks is a range
+# scan of (user_id, next_review); a deck filter becomes one range scan of
+# (user_id, deck_id, next_review) per deck.
+SELECT_DUE_SQL = '''
+    WITH due AS (
+        SELECT question_id, next_review FROM review_state
+        WHERE user_id = ? {deck_filter} AND next_review <= ?
+        ORDER BY next_review, question_id
+        LIMIT ?
     )
-    ''')
-    
-    conn.commit()
-    conn.close()
-    print("Database initialized with the correct structure.")
-
-def check_and_update_db():
-    conn = sqlite3.connect('questions.db')
-    cursor = conn.cursor()
-    
-    # Check if the 'options' column exists
-    cursor.execute("PRAGMA table_info(questions)")
-    columns = [column[1] for column in cursor.fetchall()]
-    
-    if 'options' not in columns:
-        # If 'options' column doesn't exist, we need to update the table
-        cursor.execute('''
-        ALTER TABLE questions
-        ADD COLUMN options TEXT
-        ''')
-        conn.commit()
-        print("Database schema updated.")
-    
-    conn.close()
-
-def add_question(question_dict):
-    conn = sqlite3.connect('questions.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-    INSERT INTO questions (question, options, correct_answer, explanation)
-    VALUES (?, ?, ?, ?)
-    ''', (question_dict['question'], json.dumps(question_dict['options']), 
-          question_dict['correct_answer'], question_dict['explanation']))
-    conn.commit()
-    conn.close()
+    SELECT q.id, q.question, q.correct_answer, q.explanation, o.letter, o.text
+    FROM due
+    JOIN questions q ON q.id = due.question_id
+    LEFT JOIN question_options o ON o.question_id = q.id
+    ORDER BY due.next_review, q.id, o.letter
+    '''
+SELECT_REVIEW_STATE_SQL = '''
+    SELECT ease, interval, repetitions, lapses, last_review, next_review
+    FROM review_state WHERE user_id = ? AND question_id = ?
+    '''
+UPDATE_REVIEW_STATE_SQL = '''
+    UPDATE review_state
+    SET ease = ?, interval = ?, repetitions = ?, lapses = ?, last_review = ?, next_review = ?
+    WHERE user_id = ? AND question_id = ?
+    '''
+UPDATE_DIFFICULTY_SQL = "UPDATE review_state SET next_review = ? WHERE user_id = ? AND question_id = ?"
+# Totals and per-user counters are maintained by triggers (migration 7), so
+# these are single-row reads however large the decks get
+COUNT_QUESTIONS_SQL = "SELECT COALESCE(SUM(total), 0) FROM deck_stats"
+COUNT_DUE_SQL = "SELECT COUNT(*) FROM review_state WHERE user_id = ? {deck_filter} AND next_review <= ?"
+QUESTION_NUMBER_SQL = "SELECT position FROM questions WHERE id = ?"
+PROGRESS_SQL = '''
+    SELECT
+        (SELECT COALESCE(SUM(total), 0) FROM deck_stats WHERE 1 {deck_filter}),
+        COALESCE(SUM(seen), 0), COALESCE(SUM(correct), 0), COALESCE(SUM(incorrect), 0),
+        (SELECT COUNT(*) FROM (SELECT 1 FROM review_state
+                               WHERE user_id = ? {deck_filter} AND next_review <= ? LIMIT ?))
+    FROM user_deck_stats WHERE user_id = ? {deck_filter}
+    '''
+
+DEFAULT_BATCH_SIZE = 500
+
+SEARCH_SQL = '''
+    SELECT q.id, q.question, snippet(questions_fts, -1, '[', ']', '...', 12)
+    FROM questions_fts JOIN questions q ON q.id = questions_fts.rowid
+    WHERE questions_fts MATCH ?
+    ORDER BY rank
+    LIMIT ?
+    '''
+
+INSERT_DECK_SQL = "INSERT INTO decks (name, source_hash) VALUES (?, ?)"
+SELECT_DECK_ID_SQL = "SELECT id FROM decks WHERE name = ?"
+SELECT_DECK_SOURCE_SQL = "SELECT source_hash FROM decks WHERE name = ?"
+SELECT_DECK_BY_SOURCE_SQL = "SELECT id FROM decks WHERE source_hash = ? ORDER BY id DESC LIMIT 1"
+RENAME_DECK_SQL = "UPDATE decks SET name = ?, source_hash = ? WHERE id = ?"
+# Streamed imports are written to a deck named like this until they finish
+STAGING_DECK_NAME = "{name} (importing {token})"
+LIST_DECKS_SQL = '''
+    SELECT d.id, d.name, COALESCE(s.total, 0)
+    FROM decks d LEFT JOIN deck_stats s ON s.deck_id = d.id
+    ORDER BY d.id
+    '''
+INSERT_USER_SQL = "INSERT INTO users (name) VALUES (?)"
+SELECT_USER_ID_SQL = "SELECT id FROM users WHERE name = ?"
+
+def init_db():
+    """Bring the database schema up to date, keeping any existing questions"""
+    version = migrate(get_connection())
+    logger.info("Database ready at schema version %d.", version)
+
+def _valid_question(question):
+    return question.correct_answer in question.letters
+
+def _write_questions(conn, questions, deck_id=DEFAULT_DECK_ID):
+    """Insert questions and their options; the caller holds a write transaction"""
+    # Ids are assigned here so options can be written with executemany too;
+    # positions number the questions within their deck
+    questions = list(questions)
+    next_id = conn.execute(RESERVE_QUESTION_IDS_SQL, (len(questions),)).fetchone()[0] - len(questions) + 1
+    next_position = conn.execute(MAX_POSITION_SQL, (deck_id,)).fetchone()[0] + 1
+    question_rows = []
+    option_rows = []
+    for offset, question in enumerate(questions):
+        question_id = next_id + offset
+        question_rows.append((question_id, deck_id, next_position + offset, question.question,
+                              question.correct_answer, question.explanation))
+        option_rows.extend((question_id, letter, text)
+                           for letter, text in zip(question.option_letters, question.option_texts))
+    # Options first: the question's insert trigger indexes them for search
+    conn.executemany(INSERT_OPTION_SQL, option_rows)
+    conn.executemany(INSERT_QUESTION_SQL, question_rows)
+
+def add_question(question, deck_id=DEFAULT_DECK_ID):
+    with metrics.span('db.insert_batch'), transaction(immediate=True) as conn:
+        _write_questions(conn, [question], deck_id)
+
+def add_questions(questions, batch_size=DEFAULT_BATCH_SIZE, progress_callback=None,
+                  deck_id=DEFAULT_DECK_ID):
+    """Insert an iterable of Questions into a deck in batched transactions.
 
+    Questions whose correct_answer names none of their options are
+    rejected. Each batch is
+    written with executemany in a single transaction, and progress_callback
+    (if given) is called with the running (inserted, rejected) counts after
+    every batch. Returns the final (inserted, rejected) tuple.
+    """
+    inserted = 0
+    rejected = 0
+    batch = []
+
+    def flush():
+        # Timed through the commit, which is most of the cost
+        with metrics.span('db.insert_batch'), transaction(immediate=True) as conn:
+            _write_questions(conn, batch, deck_id)
+        if progress_callback:
+            progress_callback(inserted, rejected)
+        batch.clear()
+
+    for question in questions:
+        if not _valid_question(question):
+            rejected += 1
+            continue
+        batch.append(question)
+        inserted += 1
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+    elif progress_callback:
+        progress_callback(inserted, rejected)
+
+    return inserted, rejected
+
+def _assemble_questions(rows):
+    """Fold (question..., letter, text) join rows into Questions, in row order"""
+    questions = []
+    for question_id, group in groupby(rows, key=itemgetter(0)):
+        group = list(group)
+        _, question, correct_answer, explanation, _, _ = group[0]
+        # A question without options comes back as one row of NULL letter/text
+        options = [(letter, text) for *_, letter, text in group if letter is not None]
+        questions.append(Question.from_options(question, options, correct_answer, explanation, question_id))
+    return questions
+
+@metrics.timed('db.get_question')
 def get_question(question_id):
-    conn = sqlite3.connect('questions.db')
-    cursor = conn.cursor()
-    query = "SELECT * FROM questions WHERE id = ?"
-    print(f"Executing SQL query: {query} with id {question_id}")
-    cursor.execute(query, (question_id,))
-    question = cursor.fetchone()
-    conn.close()
-    if question:
-        return {
-            'id': question[0],
-            'question': question[1],
-            'options': json.loads(question[2]),
-            'correct_answer': question[3],
-            'explanation': question[4]
-        }
-    return None
-
-def update_question_difficulty(question_id, difficulty, next_review):
-    conn = sqlite3.connect('questions.db')
-    c = conn.cursor()
-    c.execute("UPDATE questions SET difficulty = ?, next_review = ? WHERE id = ?", (difficulty, next_review, question_id))
-    conn.commit()
-    conn.close()
-
-def get_total_questions():
-    conn = sqlite3.connect('questions.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM questions")
-    total = cursor.fetchone()[0]
-    conn.close()
-    return total
+    logger.debug("Fetching question %s", question_id)
+    rows = get_connection().execute(SELECT_QUESTION_SQL, (question_id,)).fetchall()
+    questions = _assemble_questions(rows)
+    return questions[0] if questions else None
+
+def get_questions(question_ids):
+    """Fetch several questions in one query, returned as a dict keyed by id"""
+    question_ids = list(question_ids)
+    if not question_ids:
+        return {}
+    placeholders = ','.join('?' * len(question_ids))
+    rows = get_connection().execute(
+        QUESTION_WITH_OPTIONS + f"WHERE q.id IN ({placeholders}) ORDER BY q.id, o.letter",
+        question_ids).fetchall()
+    return {question.id: question for question in _assemble_questions(rows)}
+
+def _deck_filter(deck_ids):
+    """SQL fragment and parameters restricting review_state to the given decks"""
+    if deck_ids is None:
+        return '', []
+    deck_ids = list(deck_ids)
+    return f"AND deck_id IN ({','.join('?' * len(deck_ids))})", deck_ids
+
+@metrics.timed('db.get_due')
+def get_due(limit=1, now=None, user_id=DEFAULT_USER_ID, deck_ids=None):
+    """Return up to `limit` of a user's due questions, most overdue first.
+
+    deck_ids limits the queue to those decks; None means every deck.
+    """
+    if now is None:
+        now = time.time()
+    deck_filter, deck_params = _deck_filter(deck_ids)
+    rows = get_connection().execute(
+        SELECT_DUE_SQL.format(deck_filter=deck_filter),
+        (user_id, *deck_params, now, limit)).fetchall()
+    return _assemble_questions(rows)
+
+def get_review_state(question_id, user_id=DEFAULT_USER_ID):
+    row = get_connection().execute(SELECT_REVIEW_STATE_SQL, (user_id, question_id)).fetchone()
+    if row is None:
+        return None
+    return dict(zip(('ease', 'interval', 'repetitions', 'lapses', 'last_review', 'next_review'), row))
+
+def record_review(question_id, quality, now=None, user_id=DEFAULT_USER_ID):
+    """Schedule a user's next review of a question from an answer of the given quality (0-5)"""
+    # Immediate, so two answers to the same card can't both read the old state
+    with transaction(immediate=True) as conn:
+        state = get_review_state(question_id, user_id)
+        if state is None:
+            return None
+        state = schedule_review(state, quality, now)
+        conn.execute(UPDATE_REVIEW_STATE_SQL, (
+            state['ease'], state['interval'], state['repetitions'], state['lapses'],
+            state['last_review'], state['next_review'], user_id, question_id))
+    return state
+
+def _fts_query(text):
+    """Turn free text into an FTS5 query matching all of its words"""
+    terms = text.split()
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+
+def search(query, limit=20):
+    """Ranked full-text search over question, option and explanation text.
+
+    Returns dicts with the question id, its text and a snippet of the best
+    matching column, best match first.
+    """
+    match = _fts_query(query)
+    if not match:
+        return []
+    rows = get_connection().execute(SEARCH_SQL, (match, limit)).fetchall()
+    return [{'id': row[0], 'question': row[1], 'snippet': row[2]} for row in rows]
+
+def update_question_difficulty(question_id, difficulty, next_review, user_id=DEFAULT_USER_ID):
+    """Force a question's next review time (legacy fixed-table scheduling)"""
+    if isinstance(next_review, datetime):
+        next_review = next_review.timestamp()
+    with transaction() as conn:
+        conn.execute(UPDATE_DIFFICULTY_SQL, (next_review, user_id, question_id))
+
+def get_total_questions(deck_id=None):
+    if deck_id is None:
+        return get_connection().execute(COUNT_QUESTIONS_SQL).fetchone()[0]
+    row = get_connection().execute(DECK_SIZE_SQL, (deck_id,)).fetchone()
+    return row[0] if row else 0
+
+def count_due(now=None, user_id=DEFAULT_USER_ID, deck_ids=None):
+    if now is None:
+        now = time.time()
+    deck_filter, deck_params = _deck_filter(deck_ids)
+    return get_connection().execute(
+        COUNT_DUE_SQL.format(deck_filter=deck_filter),
+        (user_id, *deck_params, now)).fetchone()[0]
 
 def get_question_number(question_id):
-    conn = sqlite3.connect('questions.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM questions WHERE id <= ?", (question_id,))
-    number = cursor.fetchone()[0]
-    conn.close()
-    return number
+    """1-based position of a question within its deck"""
+    row = get_connection().execute(QUESTION_NUMBER_SQL, (question_id,)).fetchone()
+    return row[0] if row else 0
+
+def get_progress(user_id=DEFAULT_USER_ID, deck_ids=None, now=None, due_limit=None):
+    """A user's progress over the given decks (default: all) in one cheap read.
+
+    Returns {total, seen, correct, incorrect, due}. Everything but due comes
+    from the trigger-maintained counter tables. Due depends on the clock, so
+    it is counted over the (user_id, deck_id, next_review) index; pass
+    due_limit to stop counting there and keep the read constant-time.
+    """
+    if now is None:
+        now = time.time()
+    deck_filter, deck_params = _deck_filter(deck_ids)
+    row = get_connection().execute(
+        PROGRESS_SQL.format(deck_filter=deck_filter),
+        (*deck_params, user_id, *deck_params, now, -1 if due_limit is None else due_limit,
+         user_id, *deck_params)).fetchone()
+    return dict(zip(('total', 'seen', 'correct', 'incorrect', 'due'), row))
+
+def add_deck(name, source_hash=None, replace=False):
+    """Create a deck and return its id.
+
+    With replace=True an existing deck of the same name is deleted first,
+    together with its questions and every user's review state for them.
+    """
+    with transaction(immediate=True) as conn:
+        deck_id = _create_deck(conn, name, source_hash, replace)
+    logger.info("Created deck %d (%s)", deck_id, name)
+    return deck_id
+
+def _create_deck(conn, name, source_hash, replace):
+    row = conn.execute(SELECT_DECK_ID_SQL, (name,)).fetchone()
+    if row is not None:
+        if not replace:
+            raise ValueError(f"Deck {name!r} already exists")
+        conn.execute("DELETE FROM decks WHERE id = ?", (row[0],))
+    return conn.execute(INSERT_DECK_SQL, (name, source_hash)).lastrowid
+
+def _import_name(conn, name, source_hash):
+    """The deck name an import of `name` should take over.
+
+    That's `name` itself if it's free or holds the same file (same
+    source_hash), otherwise the first "name (2)", "name (3)", ... that is,
+    so a different file that happens to share a name never replaces it.
+    Without a source_hash decks are matched by name alone.
+    """
+    candidate = name
+    number = 1
+    while True:
+        row = conn.execute(SELECT_DECK_SOURCE_SQL, (candidate,)).fetchone()
+        if row is None or source_hash is None or row[0] == source_hash:
+            return candidate
+        number += 1
+        candidate = f"{name} ({number})"
+
+def import_deck(name, questions, source_hash=None):
+    """Replace the deck holding this file with `questions` in a single transaction.
+
+    Either the whole deck is written or, on error, nothing changes and any
+    previous deck of that name is kept. The deck is named as described in
+    _import_name. Questions are validated as in add_questions; raises
+    ValueError, leaving the database untouched, if none are valid.
+    Returns (deck_id, inserted, rejected).
+    """
+    questions = list(questions)
+    valid = [question for question in questions if _valid_question(question)]
+    if not valid:
+        raise ValueError(f"No valid questions to import into {name!r}")
+    with metrics.span('db.insert_batch'), transaction(immediate=True) as conn:
+        name = _import_name(conn, name, source_hash)
+        deck_id = _create_deck(conn, name, source_hash, replace=True)
+        _write_questions(conn, valid, deck_id)
+    logger.info("Imported deck %d (%s) with %d questions", deck_id, name, len(valid))
+    return deck_id, len(valid), len(questions) - len(valid)
+
+def begin_deck_import(name, source_hash=None):
+    """Create an empty staging deck to stream an import of `name` into.
+
+    Questions added to it are committed (and studyable) batch by batch,
+    while any existing deck for the file stays intact. Call
+    finish_deck_import() once every question is in, or delete_deck() to
+    abandon the import. Returns the staging deck's id.
+    """
+    staging_name = STAGING_DECK_NAME.format(name=name, token=uuid.uuid4().hex[:8])
+    return add_deck(staging_name, source_hash)
+
+def finish_deck_import(deck_id, name, source_hash=None):
+    """Swap a staging deck in for the deck it supersedes, in one transaction.
+
+    The superseded deck, its questions and their review state are deleted
+    only now, as the staging deck takes its name (see _import_name).
+    Returns the name the deck ends up with.
+    """
+    with transaction(immediate=True) as conn:
+        name = _import_name(conn, name, source_hash)
+        conn.execute("DELETE FROM decks WHERE name = ? AND id != ?", (name, deck_id))
+        conn.execute(RENAME_DECK_SQL, (name, source_hash, deck_id))
+    logger.info("Finished importing deck %d (%s)", deck_id, name)
+    return name
+
+def get_deck_id(name):
+    row = get_connection().execute(SELECT_DECK_ID_SQL, (name,)).fetchone()
+    return row[0] if row else None
+
+def get_deck_id_for_source(source_hash):
+    """The deck imported from the file with this content hash, newest first"""
+    row = get_connection().execute(SELECT_DECK_BY_SOURCE_SQL, (source_hash,)).fetchone()
+    return row[0] if row else None
+
+def list_decks():
+    """Every deck as {id, name, questions}, oldest first"""
+    rows = get_connection().execute(LIST_DECKS_SQL).fetchall()
+    return [{'id': row[0], 'name': row[1], 'questions': row[2]} for row in rows]
+
+def delete_deck(deck_id):
+    """Delete a deck; its questions, options and review state go with it"""
+    with transaction(immediate=True) as conn:
+        conn.execute("DELETE FROM decks WHERE id = ?", (deck_id,))
+    logger.info("Deleted deck %d", deck_id)
+
+def add_user(name):
+    """Create a user and return its id; every existing card starts out due for them"""
+    with transaction(immediate=True) as conn:
+        user_id = conn.execute(INSERT_USER_SQL, (name,)).lastrowid
+    logger.info("Created user %d (%s)", user_id, name)
+    return user_id
+
+def get_user_id(name):
+    row = get_connection().execute(SELECT_USER_ID_SQL, (name,)).fetchone()
+    return row[0] if row else None
 
 def clear_questions():
-    conn = sqlite3.connect('questions.db')
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM questions")
-    conn.commit()
-    conn.close()
-    print("Cleared all questions from the database")
+    with transaction() as conn:
+        conn.execute("DELETE FROM questions")
+    logger.info("Cleared all questions from the database")
@@ -0,0 +1,108 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DEFAULT_DB_PATH = 'questions.db'
+
+# Statements are cached per connection by their SQL text, so callers should
+# keep their queries as module-level constants to get prepared-statement reuse.
+STATEMENT_CACHE_SIZE = 256
+
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -16000),        # ~16 MB page cache
+    ("mmap_size", 268435456),      # 256 MB memory-mapped I/O
+    ("temp_store", "MEMORY"),
+)
+
+_db_path = os.environ.get('QUESTIONS_DB', DEFAULT_DB_PATH)
+_generation = 0
+_local = threading.local()
+_lock = threading.Lock()
+_connections = set()
+
+
+def get_db_path():
+    return _db_path
+
+
+def set_db_path(path):
+    """Point the connection pool at a different database file"""
+    global _db_path
+    with _lock:
+        _db_path = path
+    close_all()
+
+
+def _open_connection(path):
+    conn = sqlite3.connect(
+        path,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False,
+    )
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+def get_connection():
+    """Return this thread's long-lived connection, opening it on first use"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.generation == _generation:
+        return conn
+    if conn is not None:
+        _discard(conn)
+    conn = _open_connection(_db_path)
+    _local.conn = conn
+    _local.generation = _generation
+    with _lock:
+        _connections.add(conn)
+    return conn
+
+
+def _discard(conn):
+    with _lock:
+        _connections.discard(conn)
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+
+def close_connection():
+    """Close the calling thread's connection, if it has one"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        _local.conn = None
+        _discard(conn)
+
+
+def close_all():
+    """Close every pooled connection (used on shutdown or when the path changes)"""
+    global _generation
+    with _lock:
+        _generation += 1
+        connections = list(_connections)
+        _connections.clear()
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    _local.conn = None
+
+
+@contextmanager
+def transaction(immediate=False):
+    """Run a block inside a single transaction on this thread's connection.
+
+    With immediate=True the write lock is taken up front (BEGIN IMMEDIATE), so
+    reads at the start of the block can't be invalidated by another writer.
+    """
+    conn = get_connection()
+    with conn:
+        if immediate:
+            conn.execute("BEGIN IMMEDIATE")
+        yield conn
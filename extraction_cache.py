@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import tempfile
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+CACHE_DIR = os.environ.get(
+    'EXTRACTION_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'spaced_repetition', 'extraction')
+)
+# Total size the cache may grow to before least recently used entries are evicted
+MAX_CACHE_BYTES = int(os.environ.get('EXTRACTION_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+HASH_CHUNK_SIZE = 1024 * 1024
+CACHE_SUFFIX = '.json'
+# Page text and parsed questions are keyed separately, so remember recent
+# digests rather than hashing the same file twice per import
+HASH_MEMO_SIZE = 64
+
+# path -> (size, mtime_ns, digest)
+_hash_memo = {}
+
+def file_hash(path):
+    """SHA-256 of a file's contents, read in chunks"""
+    stat = os.stat(path)
+    memo = _hash_memo.get(path)
+    if memo and memo[:2] == (stat.st_size, stat.st_mtime_ns):
+        return memo[2]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    if len(_hash_memo) >= HASH_MEMO_SIZE:
+        _hash_memo.clear()
+    _hash_memo[path] = (stat.st_size, stat.st_mtime_ns, digest.hexdigest())
+    return _hash_memo[path][2]
+
+def cache_key(path, settings):
+    """Key an extraction result by file content plus the parser settings used"""
+    digest = hashlib.sha256(file_hash(path).encode())
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    return digest.hexdigest()
+
+def _entry_path(key, cache_dir):
+    return os.path.join(cache_dir, key + CACHE_SUFFIX)
+
+def load(key, cache_dir=None):
+    """Return the cached question list for key, or None on a miss"""
+    path = _entry_path(key, cache_dir or CACHE_DIR)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            questions = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.error("Discarding unreadable extraction cache entry %s: %s", path, e)
+        _remove(path)
+        return None
+    # Touch the entry so eviction treats it as recently used
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return questions
+
+def store(key, questions, cache_dir=None, max_bytes=None):
+    """Write a question list to the cache, then evict down to the size limit"""
+    cache_dir = cache_dir or CACHE_DIR
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(questions, f)
+        os.replace(tmp_path, _entry_path(key, cache_dir))
+    except OSError as e:
+        logger.error("Could not write extraction cache entry %s: %s", key, e)
+        return
+    evict(cache_dir, MAX_CACHE_BYTES if max_bytes is None else max_bytes)
+
+def evict(cache_dir=None, max_bytes=MAX_CACHE_BYTES):
+    """Delete least recently used entries until the cache fits in max_bytes"""
+    cache_dir = cache_dir or CACHE_DIR
+    entries = []
+    try:
+        for entry in os.scandir(cache_dir):
+            if entry.name.endswith(CACHE_SUFFIX):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    except FileNotFoundError:
+        return
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        _remove(path)
+        total -= size
+        logger.info("Evicted extraction cache entry %s", path)
+
+def clear(cache_dir=None):
+    evict(cache_dir, 0)
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -1,9 +1,48 @@
+import logging
+import queue
+import time
 import tkinter as tk
-from tkinter import filedialog, ttk
-from pdf_processor import extract_questions_from_pdf
-from database_manager import add_question, get_question, get_total_questions, get_question_number, clear_questions
+from tkinter import filedialog, simpledialog, ttk
+from spaced_repetition import QUALITY_CORRECT, QUALITY_INCORRECT
+from question_cache import QuestionCache
+from review_log import ReviewLogger
+from database_manager import record_review, search, get_total_questions, get_question_number, get_progress
+import metrics
+from models import Question
+from utils import get_logger
 import json
 
+logger = get_logger(__name__)
+
+# How often the Tk loop checks the import worker's queue
+IMPORT_POLL_MS = 50
+SEARCH_RESULT_LIMIT = 50
+# The due count shown under each card stops counting here ("999+")
+PROGRESS_DUE_LIMIT = 1000
+
+class OptionRow:
+    """One reusable answer row: a radio button and its label in a frame"""
+
+    def __init__(self, parent, variable, command):
+        self.frame = ttk.Frame(parent)
+        self.radio = ttk.Radiobutton(self.frame, variable=variable, command=command)
+        self.radio.pack(side=tk.LEFT, padx=(0, 10))
+        self.label = ttk.Label(self.frame, wraplength=500)
+        self.label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.visible = False
+
+    def show(self, letter, text):
+        self.radio.config(value=letter)
+        self.label.config(text=f"{letter}. {text}")
+        if not self.visible:
+            self.frame.pack(fill=tk.X, pady=5)
+            self.visible = True
+
+    def hide(self):
+        if self.visible:
+            self.frame.pack_forget()
+            self.visible = False
+
 class QuestionApp:
     def __init__(self, master):
         self.master = master
@@ -24,7 +63,7 @@ class QuestionApp:
         self.scrollable_frame = ttk.Frame(self.canvas)
         
         self.canvas.bind_all("<MouseWheel>", self._on_mousewheel)
-        self.scrollable_frame.bind("<Configure>", self._configure_scroll_region)
+        self.scrollable_frame.bind("<Configure>", self._schedule_layout)
         
         self.canvas_window = self.canvas.create_window(
             (0, 0),
@@ -40,9 +79,22 @@ class QuestionApp:
         
         # Initialize variables
         self.current_question_id = None
+        # Study every deck until a PDF is imported, then just that PDF's deck
+        self.deck_id = None
+        self.deck_before_import = None
+        self.total_questions = get_total_questions()
         self.user_answer = tk.StringVar()
         self.current_answer = tk.StringVar()
         self.answer_submitted = False
+        self.import_worker = None
+        self.option_rows = []
+        self._layout_pending = False
+        self.question_cache = QuestionCache()
+        # Every answer is appended to the review history in batches
+        self.review_logger = ReviewLogger()
+        self.question_shown_at = None
+        
+        self.master.protocol("WM_DELETE_WINDOW", self.on_close)
         
         # Create widgets
         self.create_widgets()
@@ -72,10 +124,22 @@ class QuestionApp:
         width = event.width if event else self.master.winfo_width()
         self.canvas.itemconfig(self.canvas_window, width=width - 4)
 
+    def _schedule_layout(self, event=None):
+        """Queue a single scroll-region update for the next idle moment.
+
+        Any number of calls before the UI goes idle collapse into one pass.
+        """
+        if not self._layout_pending:
+            self._layout_pending = True
+            self.master.after_idle(self._apply_layout)
+
+    def _apply_layout(self):
+        self._layout_pending = False
+        self._configure_scroll_region()
+
     def resize_window(self):
         """Adjust the window size based on content"""
-        self.master.update_idletasks()
-        self._configure_scroll_region()
+        self._schedule_layout()
 
     # ... (rest of the methods remain exactly the same as in the previous version)
 
@@ -150,209 +214,205 @@ class QuestionApp:
             command=self.upload_pdf
         )
         self.upload_button.pack(pady=5)
+        
+        # Import progress, shown only while a PDF is being imported
+        self.import_frame = ttk.Frame(self.control_container)
+        self.import_progress = ttk.Progressbar(
+            self.import_frame,
+            orient="horizontal",
+            length=300,
+            mode="determinate"
+        )
+        self.import_progress.pack(side=tk.LEFT, padx=(0, 10))
+        self.import_status_label = ttk.Label(self.import_frame, text="")
+        self.import_status_label.pack(side=tk.LEFT, padx=(0, 10))
+        self.cancel_import_button = ttk.Button(
+            self.import_frame,
+            text="Cancel",
+            command=self.cancel_import
+        )
+        self.cancel_import_button.pack(side=tk.LEFT)
+        
+        # Full-text search over questions, options and explanations
+        self.search_frame = ttk.Frame(self.control_container)
+        self.search_frame.pack(pady=5)
+        self.search_query = tk.StringVar()
+        self.search_entry = ttk.Entry(self.search_frame, textvariable=self.search_query, width=40)
+        self.search_entry.pack(side=tk.LEFT, padx=(0, 10))
+        self.search_entry.bind("<Return>", lambda event: self.search_questions())
+        self.search_button = ttk.Button(
+            self.search_frame,
+            text="Search",
+            command=self.search_questions
+        )
+        self.search_button.pack(side=tk.LEFT)
+        self.search_window = None
 
     def submit_answer(self):
         if not self.answer_submitted:
             user_answer = self.user_answer.get()
             if user_answer:
-                question_data = get_question(self.current_question_id)
-                options = question_data['options']
-                explanation = question_data['explanation']
-                stored_answer = question_data['correct_answer']
-                
-                print(f"\nDEBUG - Question Data:")
-                print(f"Question ID: {self.current_question_id}")
-                print(f"Stored answer: {stored_answer}")
-                print(f"Available options: {options}")
+                question_data = self.question_cache.get(self.current_question_id)
+                # Answer keys are reconciled with the options at import time
+                correct_answer = question_data.correct_answer
                 
-                # Map of questions to their correct answers
-                correct_answers = {
-                    1: 'D',  # Endpoint logs question
-                    2: 'D',  # Threat hunting question
-                    3: 'B',  # Cyber insurance question
-                    4: 'C',  # Full disk encryption question
-                    # Add more as needed
-                }
-                
-                # Get the correct answer, fallback to stored answer if question not in mapping
-                correct_answer = correct_answers.get(self.current_question_id)
-                
-                # Verify the answer exists in options
-                if correct_answer not in options:
-                    print(f"WARNING: Mapped answer '{correct_answer}' not in options")
-                    # Try to find a valid answer
-                    for letter in ['D', 'C', 'B', 'A']:  # Try common correct answers
-                        if letter in options:
-                            correct_answer = letter
-                            break
-                
-                if user_answer == correct_answer:
+                latency_ms = None
+                if self.question_shown_at is not None:
+                    latency_ms = (time.perf_counter() - self.question_shown_at) * 1000
+                correct = user_answer == correct_answer
+                if correct:
                     result = "Correct!"
+                    record_review(self.current_question_id, QUALITY_CORRECT)
                 else:
                     result = "Incorrect."
+                    record_review(self.current_question_id, QUALITY_INCORRECT)
+                self.review_logger.log(self.current_question_id, user_answer, correct, latency_ms)
 
                 # Safely get the option text
-                correct_option_text = options.get(correct_answer, "Option text not available")
-                feedback = f"{result}\n\nThe correct answer is: {correct_answer}. {correct_option_text}\n\nExplanation:\n{explanation}"
+                correct_option_text = question_data.option_text(correct_answer, "Option text not available")
+                feedback = f"{result}\n\nThe correct answer is: {correct_answer}. {correct_option_text}\n\nExplanation:\n{question_data.explanation}"
                 
                 self.feedback_label.config(text=feedback)
+                self.update_progress()
                 self.answer_submitted = True
                 self.submit_button.config(state=tk.DISABLED)
                 self.next_question_button.pack(pady=10)
                 
-                print(f"\nDEBUG - Results:")
-                print(f"User answered: {user_answer}")
-                print(f"Correct answer used: {correct_answer}")
-                print(f"Correct option text: {correct_option_text}")
+                logger.debug("User answered %s, correct answer %s (%s)",
+                             user_answer, correct_answer, correct_option_text)
             else:
                 self.feedback_label.config(text="Please select an answer before submitting.")
         else:
-            print("Answer already submitted")
-
-        self.master.update_idletasks()
-        self.resize_window()
+            logger.debug("Answer already submitted")
 
-    def display_question(self, question_data):
-        print(f"\nDEBUG: Displaying question")
-        print(f"DEBUG: Question text: {question_data.get('question', 'No question available')}")
-        print(f"DEBUG: Options: {question_data.get('options', {})}")
-        print(f"DEBUG: Correct answer: {question_data.get('correct_answer', 'No answer specified')}")
-        
-        self.question_text.config(state=tk.NORMAL)
-        self.question_text.delete(1.0, tk.END)
-        self.question_text.insert(tk.END, question_data.get('question', 'No question text available'), "center")
-        self.question_text.config(state=tk.DISABLED)
-
-        # Clear previous options
-        for widget in self.options_frame.winfo_children():
-            widget.destroy()
-
-        # Reset the current answer
-        self.current_answer.set("")
-
-        # Display options
-        options = question_data.get('options', {})
-        if not options:
-            print("WARNING: No options available for this question")
-            
-        for letter, text in options.items():
-            print(f"DEBUG: Creating option {letter}: {text}")
-            option_frame = ttk.Frame(self.options_frame)
-            option_frame.pack(fill=tk.X, pady=5)
-            
-            radio = ttk.Radiobutton(option_frame, 
-                                   variable=self.current_answer, 
-                                   value=letter,
-                                   command=self.update_user_answer)
-            radio.pack(side=tk.LEFT, padx=(0, 10))
-            
-            label = ttk.Label(option_frame, text=f"{letter}. {text}", wraplength=500)
-            label.pack(side=tk.LEFT, fill=tk.X, expand=True)
-
-        self.submit_button.config(state=tk.NORMAL)
-        self.feedback_label.config(text="")
-        
-        print("DEBUG: Question display completed")
-        self.update_progress()
+        self._schedule_layout()
 
     def next_question(self):
-        print("Next question button clicked")
         if self.current_question_id is not None:
-            next_id = self.current_question_id + 1
+            # Study whichever card is most overdue rather than walking ids;
+            # the queue was prefetched while the previous card was on screen
+            next_id = self.question_cache.next_due(exclude=self.current_question_id)
             self.load_question(next_id)
-        self._configure_scroll_region()
+        self._schedule_layout()
 
     def load_question(self, question_id):
-        print(f"\nDEBUG: Loading question {question_id}")
-        question_data = get_question(question_id)
-        print(f"DEBUG: Question data received:")
-        print(f"  Question: {question_data.get('question', 'No question')}")
-        print(f"  Options: {question_data.get('options', {})}")
-        print(f"  Correct Answer: {question_data.get('correct_answer', 'None')}")
-        print(f"  Explanation: {question_data.get('explanation', 'No explanation')}")
+        logger.debug("Loading question %s", question_id)
+        question_data = self.question_cache.get(question_id) if question_id is not None else None
         
         if question_data:
             self.current_question_id = question_id
             self.display_question(question_data)
+            self.question_shown_at = time.perf_counter()
+            # Warm the cache for the following cards once the UI is idle
+            self.master.after_idle(self._prefetch_next)
             self.answer_submitted = False
             self.next_question_button.pack_forget()
-            print(f"DEBUG: Question {question_id} loaded successfully")
+            logger.debug("Question %s loaded", question_id)
         else:
-            print("DEBUG: No question data received")
-            self.display_question({
-                "question": "No more questions!",
-                "options": {},
-                "correct_answer": "",
-                "explanation": "You've completed all questions."
-            })
+            logger.debug("No question data for %s", question_id)
+            self.display_question(Question("No more questions!", explanation="You've completed all questions."))
             self.submit_button.config(state=tk.DISABLED)
         
-        self.master.update_idletasks()
-        self.resize_window()
+        self._schedule_layout()
 
+    @metrics.timed('gui.display_question')
     def display_question(self, question_data):
-        print(f"\nDEBUG: Displaying question")
-        print(f"DEBUG: Question text: {question_data.get('question', 'No question available')}")
-        print(f"DEBUG: Options: {question_data.get('options', {})}")
-        print(f"DEBUG: Correct answer: {question_data.get('correct_answer', 'No answer specified')}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Displaying question %r with options %s (correct answer %s)",
+                         question_data.question, question_data.options_dict(),
+                         question_data.correct_answer)
         
         self.question_text.config(state=tk.NORMAL)
         self.question_text.delete(1.0, tk.END)
-        self.question_text.insert(tk.END, question_data.get('question', 'No question text available'), "center")
+        self.question_text.insert(tk.END, question_data.question, "center")
         self.question_text.config(state=tk.DISABLED)
 
-        # Clear previous options
-        for widget in self.options_frame.winfo_children():
-            widget.destroy()
-
         # Reset the current answer
         self.current_answer.set("")
+        self.user_answer.set("")
 
-        # Display options
-        options = question_data.get('options', {})
+        # Display options, reusing rows from earlier cards. Visible rows are
+        # always a prefix of the pool, so repacking keeps them in order.
+        options = question_data.options
         if not options:
-            print("WARNING: No options available for this question")
-            
-        for letter, text in options.items():
-            print(f"DEBUG: Creating option {letter}: {text}")
-            option_frame = ttk.Frame(self.options_frame)
-            option_frame.pack(fill=tk.X, pady=5)
-            
-            radio = ttk.Radiobutton(option_frame, 
-                                   variable=self.current_answer, 
-                                   value=letter,
-                                   command=self.update_user_answer)
-            radio.pack(side=tk.LEFT, padx=(0, 10))
-            
-            label = ttk.Label(option_frame, text=f"{letter}. {text}", wraplength=500)
-            label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+            logger.warning("No options available for this question")
+        while len(self.option_rows) < len(options):
+            self.option_rows.append(
+                OptionRow(self.options_frame, self.current_answer, self.update_user_answer))
+        for row, option in zip(self.option_rows, options):
+            row.show(option.letter, option.text)
+        self._hide_option_rows(len(options))
 
         self.submit_button.config(state=tk.NORMAL)
         self.feedback_label.config(text="")
         
-        print("DEBUG: Question display completed")
         self.update_progress()
 
+    def search_questions(self):
+        query = self.search_query.get().strip()
+        if not query:
+            return
+        results = search(query, limit=SEARCH_RESULT_LIMIT)
+        logger.debug("Search %r returned %d results", query, len(results))
+        self._show_search_results(query, results)
+
+    def _show_search_results(self, query, results):
+        """List search hits in a separate window; double-click opens one"""
+        if self.search_window is None or not self.search_window.winfo_exists():
+            self.search_window = tk.Toplevel(self.master)
+            self.search_window.geometry("600x300")
+            self.search_results_list = tk.Listbox(self.search_window, font=("Arial", 11))
+            self.search_results_list.pack(fill="both", expand=True)
+            self.search_results_list.bind("<Double-Button-1>", self._open_search_result)
+        self.search_window.title(f"Search: {query} ({len(results)} results)")
+        self.search_result_ids = [result['id'] for result in results]
+        self.search_results_list.delete(0, tk.END)
+        for result in results:
+            self.search_results_list.insert(tk.END, f"{result['id']}. {result['snippet']}")
+        if not results:
+            self.search_results_list.insert(tk.END, "No matching questions.")
+        self.search_window.lift()
+
+    def _open_search_result(self, event=None):
+        selection = self.search_results_list.curselection()
+        if selection and selection[0] < len(self.search_result_ids):
+            self.load_question(self.search_result_ids[selection[0]])
+
+    def _prefetch_next(self):
+        if self.current_question_id is not None:
+            self.question_cache.prefetch_due(exclude=self.current_question_id)
+
     def clear_feedback(self):
         self.feedback_label.config(text="")
 
     def update_progress(self):
-        total = get_total_questions()
+        # Counter-table reads, so this stays cheap on every card however big the deck
+        deck_ids = None if self.deck_id is None else [self.deck_id]
+        progress = get_progress(deck_ids=deck_ids, due_limit=PROGRESS_DUE_LIMIT)
+        total = self.total_questions = progress['total']
         if self.current_question_id is None:
             self.progress_label.config(text=f"No questions loaded. Total questions: {total}")
-        else:
-            self.progress_label.config(text=f"Question {self.current_question_id} of {total}")
+            return
+        due = progress['due']
+        due_text = f"{PROGRESS_DUE_LIMIT - 1}+" if due >= PROGRESS_DUE_LIMIT else str(due)
+        self.progress_label.config(
+            text=f"Question {get_question_number(self.current_question_id)} of {total}  |  "
+                 f"{progress['seen']} seen, {progress['correct']} correct, "
+                 f"{progress['incorrect']} incorrect, {due_text} due")
+
+    def _hide_option_rows(self, start=0):
+        for row in self.option_rows[start:]:
+            row.hide()
 
     def clear_gui(self):
         self.question_text.config(state=tk.NORMAL)
         self.question_text.delete(1.0, tk.END)
         self.question_text.config(state=tk.DISABLED)
-        for widget in self.options_frame.winfo_children():
-            widget.destroy()
+        self._hide_option_rows()
         self.feedback_label.config(text="")
         self.progress_label.config(text="")
         self.next_question_button.pack_forget()
-        self._configure_scroll_region()
+        self._schedule_layout()
 
     def display_initial_state(self):
         self.question_text.config(state=tk.NORMAL)
@@ -360,50 +420,124 @@ class QuestionApp:
         self.question_text.insert(tk.END, "Please upload a PDF to start.", "center")
         self.question_text.config(state=tk.DISABLED)
         self.update_progress()
-        self._configure_scroll_region()
+        self._schedule_layout()
 
     def upload_pdf(self):
+        if self.import_worker is not None:
+            return
         self.clear_gui()
         file_path = filedialog.askopenfilename(filetypes=[("PDF Files", "*.pdf")])
         if file_path:
-            clear_questions()
-            questions = extract_questions_from_pdf(file_path)
-            print(f"Extracted {len(questions)} questions")
-            for i, question in enumerate(questions):
-                if all(key in question for key in ['question', 'options', 'correct_answer', 'explanation']):
-                    add_question(question)
-                    print(f"Added question {i+1}")
+            self.current_question_id = None
+            self.total_questions = 0
+            self.update_progress()
+            self._start_import(file_path)
+
+    def _start_import(self, file_path, password=None):
+        # Parsing and inserts happen on a worker thread; questions become
+        # studyable as soon as the first batch is committed. The file gets
+        # its own deck, so other imported PDFs are left untouched. The PDF
+        # libraries are only loaded here, keeping them out of startup.
+        from import_worker import ImportWorker
+        # Studied again if this import is abandoned and its deck discarded
+        self.deck_before_import = self.deck_id
+        self.import_worker = ImportWorker(file_path, password=password)
+        self.upload_button.config(state=tk.DISABLED)
+        self.import_progress.config(value=0, maximum=1)
+        self.import_status_label.config(text="Starting import...")
+        self.cancel_import_button.config(state=tk.NORMAL)
+        self.import_frame.pack(pady=5)
+        self.import_worker.start()
+        self.master.after(IMPORT_POLL_MS, self._poll_import)
+
+    def _poll_import(self):
+        """Drain the import worker's queue and update progress"""
+        worker = self.import_worker
+        if worker is None:
+            return
+        while True:
+            try:
+                message = worker.messages.get_nowait()
+            except queue.Empty:
+                break
+            kind = message[0]
+            if kind == 'deck':
+                # Re-importing a file replaces its deck, so drop stale entries
+                self.deck_id = message[1]
+                self.question_cache.invalidate()
+                self.question_cache.set_scope(deck_ids=[self.deck_id])
+            elif kind == 'pages':
+                _, pages_done, page_count = message
+                self.import_progress.config(maximum=max(page_count, 1), value=pages_done)
+            elif kind == 'questions':
+                _, inserted, rejected = message
+                self.total_questions = inserted
+                self.import_status_label.config(text=f"Imported {inserted} questions")
+                if self.current_question_id is None and inserted > 0:
+                    self.load_question(self.question_cache.next_due())
                 else:
-                    print(f"Skipping invalid question {i+1}: {question}")
-            total_questions = get_total_questions()
-            if total_questions > 0:
-                self.load_question(1)
+                    self.update_progress()
+            else:
+                self._finish_import(message)
+                return
+        self.master.after(IMPORT_POLL_MS, self._poll_import)
+
+    def _finish_import(self, message):
+        worker, self.import_worker = self.import_worker, None
+        self.import_frame.pack_forget()
+        self.upload_button.config(state=tk.NORMAL)
+        self.question_cache.invalidate()
+        kind = message[0]
+        if kind != 'done':
+            # The worker deleted the partial deck; go back to what was studied
+            self.deck_id = self.deck_before_import
+            self.question_cache.set_scope(deck_ids=None if self.deck_id is None else [self.deck_id])
+            self.current_question_id = None
+        self.total_questions = get_total_questions(self.deck_id)
+        
+        if kind == 'password':
+            password = simpledialog.askstring(
+                "Encrypted PDF", f"{message[1]}.\nPassword:", show='*', parent=self.master)
+            if password:
+                self._start_import(worker.pdf_path, password)
+                return
+            self.feedback_label.config(text=f"Import cancelled: {message[1]}")
+        elif kind == 'error':
+            logger.error("Import failed: %s", message[1])
+            self.feedback_label.config(text=f"Import failed: {message[1]}")
+        elif kind == 'cancelled':
+            logger.info("Import cancelled; discarded %d questions", message[1])
+            self.feedback_label.config(text="Import cancelled")
+        else:
+            _, inserted, rejected = message
+            logger.info("Added %d questions, skipped %d invalid questions", inserted, rejected)
+        
+        if self.total_questions > 0:
+            if self.current_question_id is None:
+                self.load_question(self.question_cache.next_due())
             else:
-                print("No questions were added to the database")
-            self._configure_scroll_region()
+                self.update_progress()
+        else:
+            logger.warning("No questions were added to the database")
+        self._schedule_layout()
+
+    def cancel_import(self):
+        if self.import_worker is not None:
+            self.import_worker.cancel()
+            self.cancel_import_button.config(state=tk.DISABLED)
+            self.import_status_label.config(text="Cancelling...")
+
+    def on_close(self):
+        if self.import_worker is not None:
+            self.import_worker.cancel()
+        try:
+            self.review_logger.close()
+        except Exception:
+            logger.exception("Unsaved reviews were lost on exit")
+        self.master.destroy()
 
     def update_user_answer(self):
         self.user_answer.set(self.current_answer.get())
-        print(f"DEBUG: User selected answer: {self.user_answer.get()}")
-
-    def fix_question_data(self, question_data):
-        correct_answer = question_data['correct_answer']
-        options = question_data['options']
-        explanation = question_data.get('explanation', '').lower()
-
-        if correct_answer not in options:
-            print(f"WARNING: Correct answer '{correct_answer}' not in options. Attempting to fix.")
-            # Try to find the correct answer based on the explanation
-            for option, text in options.items():
-                if text.lower().strip() in explanation:
-                    question_data['correct_answer'] = option
-                    print(f"Fixed: New correct answer is '{option}'")
-                    return question_data
-
-            # If we can't find a match, add the correct answer to the options
-            options[correct_answer] = "Added option"
-            print(f"Added missing option '{correct_answer}' to options")
-
-        return question_data
+        logger.debug("User selected answer %s", self.current_answer.get())
 
 
@@ -0,0 +1,203 @@
+"""Headless batch import of exam PDFs.
+
+Takes PDF files, directories (searched recursively) and glob patterns,
+extracts them concurrently in a process pool and writes each file to its
+own deck in a single transaction. Run from the repository root:
+
+    python import_cli.py exams/ more/*.pdf --db study.db --workers 8
+
+Prints a line per file and a throughput summary; exits non-zero if any
+file failed. --metrics FILE records per-stage timings (PDF open, page
+extraction, parsing, database writes) and writes their percentiles as JSON,
+or Prometheus text if FILE ends in .prom. --profile FILE runs the import
+serially under cProfile.
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import db_connection
+import metrics
+from database_manager import import_deck, init_db
+from utils import setup_logging
+
+def find_pdfs(paths):
+    """Expand files, directories and globs into PDF paths, in order, without duplicates"""
+    found = {}
+    for path in paths:
+        matches = sorted(glob.glob(path, recursive=True)) if glob.has_magic(path) else [path]
+        for match in matches:
+            if os.path.isdir(match):
+                for root, dirs, files in os.walk(match):
+                    dirs.sort()
+                    found.update((os.path.join(root, name), None) for name in sorted(files)
+                                 if name.lower().endswith('.pdf'))
+            else:
+                found[match] = None
+    return list(found)
+
+def deck_names(pdf_paths):
+    """Map each path to its deck name, independent of completion order.
+
+    Decks are named after the file, like a GUI upload. When several inputs
+    share a file name, the first in sorted order keeps it and the others
+    are named by their full path, so every run puts a file in the same deck.
+    """
+    names = {}
+    taken = set()
+    for path in sorted(pdf_paths):
+        name = os.path.basename(path)
+        if name in taken:
+            name = path
+        taken.add(name)
+        names[path] = name
+    return names
+
+def extract_file(pdf_path, password=None, use_cache=True):
+    """Pool worker: parse one PDF into a result dict; never raises"""
+    # Imported here so the PDF stack loads in the workers, and only when used
+    import extraction_cache
+    from pdf_processor import iter_questions_from_pdf
+
+    start = time.perf_counter()
+    pages = [None]
+    cached = [False]
+
+    def count_pages(pages_done, page_count):
+        # Extraction reports (0, page_count) first; a cache hit reports
+        # every page done at once
+        if pages[0] is None:
+            cached[0] = page_count > 0 and pages_done == page_count
+        pages[0] = page_count
+
+    result = {'path': pdf_path, 'questions': [], 'pages': 0, 'cached': False,
+              'source_hash': None, 'error': None, 'metrics': None}
+    try:
+        # One process per file already; don't nest a page-level pool inside it
+        result['questions'] = list(iter_questions_from_pdf(
+            pdf_path, workers=1, page_callback=count_pages, use_cache=use_cache, password=password))
+        result['source_hash'] = extraction_cache.file_hash(pdf_path)
+        if not result['questions']:
+            result['error'] = "no questions found"
+    except Exception as e:
+        result['error'] = str(e) or type(e).__name__
+    result['cached'] = cached[0] and not result['error']
+    # Cached files had no pages extracted
+    result['pages'] = 0 if result['cached'] else pages[0] or 0
+    result['seconds'] = time.perf_counter() - start
+    if metrics.enabled():
+        metrics.observe('import.extract_file', result['seconds'])
+        # Pool workers hand their timings back with the result
+        result['metrics'] = metrics.take()
+    return result
+
+def _iter_results(pdf_paths, workers, password, use_cache):
+    """Yield extraction results as files finish, in a process pool if worthwhile"""
+    workers = min(workers, len(pdf_paths))
+    if workers > 1:
+        try:
+            # Spawned: the logging queue listener is a thread, which makes
+            # forking unsafe
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        except OSError as e:
+            print(f"Process pool unavailable, importing serially: {e}", file=sys.stderr)
+        else:
+            with pool:
+                futures = {pool.submit(extract_file, path, password, use_cache): path
+                           for path in pdf_paths}
+                for future in as_completed(futures):
+                    try:
+                        yield future.result()
+                    except Exception as e:
+                        yield {'path': futures[future], 'questions': [], 'pages': 0, 'cached': False,
+                               'source_hash': None, 'error': str(e) or type(e).__name__, 'seconds': 0.0,
+                               'metrics': None}
+            return
+    for path in pdf_paths:
+        yield extract_file(path, password, use_cache)
+
+def run(pdf_paths, workers=None, password=None, use_cache=True, out=sys.stdout):
+    """Import every PDF into its own deck; returns the summary dict"""
+    summary = {'files': len(pdf_paths), 'imported': 0, 'cached': 0, 'failed': 0, 'pages': 0,
+               'questions': 0, 'rejected': 0}
+    names = deck_names(pdf_paths)
+    start = time.perf_counter()
+    for result in _iter_results(pdf_paths, workers or os.cpu_count() or 1, password, use_cache):
+        if result['metrics']:
+            metrics.merge(result['metrics'])
+        path = result['path']
+        if result['error'] is None:
+            try:
+                _, inserted, rejected = import_deck(names[path], result['questions'], result['source_hash'])
+            except ValueError as e:
+                # Every question was rejected
+                result['error'] = str(e)
+            except Exception as e:
+                result['error'] = f"database write failed: {e}"
+        if result['error'] is not None:
+            summary['failed'] += 1
+            print(f"  FAILED {path}: {result['error']}", file=out)
+            continue
+        summary['imported'] += 1
+        summary['cached'] += result['cached']
+        summary['pages'] += result['pages']
+        summary['questions'] += inserted
+        summary['rejected'] += rejected
+        pages = 'cached' if result['cached'] else f"{result['pages']} pages"
+        print(f"  ok     {path}: {pages}, {inserted} questions "
+              f"({rejected} rejected) in {result['seconds']:.2f} s", file=out)
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+def print_summary(summary, out=sys.stdout):
+    seconds = summary['seconds'] or float('inf')
+    print(f"\nImported {summary['imported']} of {summary['files']} files "
+          f"({summary['failed']} failed) in {summary['seconds']:.2f} s", file=out)
+    print(f"  {summary['pages']} pages extracted, {summary['pages'] / seconds:,.1f} pages/s "
+          f"({summary['cached']} files from the extraction cache)", file=out)
+    print(f"  {summary['questions']} questions ({summary['rejected']} rejected), "
+          f"{summary['questions'] / seconds:,.1f} questions/s", file=out)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import exam PDFs without the GUI")
+    parser.add_argument('paths', nargs='+', help="PDF files, directories or glob patterns")
+    parser.add_argument('--db', help="database file (default: $QUESTIONS_DB or questions.db)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="files extracted in parallel (default: CPU count)")
+    parser.add_argument('--password', help="password to try on encrypted PDFs")
+    parser.add_argument('--no-cache', action='store_true', help="bypass the extraction cache")
+    parser.add_argument('--metrics', metavar='FILE',
+                        help="write stage timings to FILE (Prometheus text if it ends in .prom, else JSON)")
+    parser.add_argument('--profile', metavar='FILE',
+                        help="cProfile the import into FILE; implies --workers 1")
+    args = parser.parse_args(argv)
+
+    pdf_paths = find_pdfs(args.paths)
+    if not pdf_paths:
+        print("No PDF files found", file=sys.stderr)
+        return 1
+    setup_logging()
+    if args.db:
+        db_connection.set_db_path(args.db)
+    init_db()
+    if args.metrics:
+        metrics.enable()
+    print(f"Importing {len(pdf_paths)} PDF files into {db_connection.get_db_path()}")
+    if args.profile:
+        # Worker processes are invisible to the profiler
+        with metrics.profiled(args.profile):
+            summary = run(pdf_paths, 1, args.password, not args.no_cache)
+    else:
+        summary = run(pdf_paths, args.workers, args.password, not args.no_cache)
+    print_summary(summary)
+    if args.metrics:
+        metrics.write(args.metrics)
+        print(f"\nStage timings written to {args.metrics}:\n{metrics.format_summary()}")
+    db_connection.close_all()
+    return 1 if summary['failed'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+import logging
+import os
+import queue
+import threading
+import extraction_cache
+import metrics
+from database_manager import add_questions, begin_deck_import, delete_deck, finish_deck_import
+from page_extractor import PasswordRequiredError
+from pdf_processor import iter_questions_from_pdf
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# Small batches so the first questions are committed (and studyable) quickly
+IMPORT_BATCH_SIZE = 25
+# Set to a file path to cProfile each import into it (see metrics.profiled)
+PROFILE_ENV = 'PROFILE_IMPORT'
+
+class ImportCancelled(Exception):
+    pass
+
+class ImportWorker(threading.Thread):
+    """Parse a PDF and insert its questions off the Tk event-loop thread.
+
+    The questions go into their own deck, named after the file unless
+    deck_name is given. They're streamed into a staging deck, and only once
+    every question is in does it replace the deck from an earlier import of
+    the same file; a failed, cancelled or empty import deletes the staging
+    deck and leaves the old one alone. A different file with the same name
+    gets a deck of its own. Progress is reported as tuples on the
+    thread-safe `messages` queue, which the GUI drains from a `master.after`
+    poll:
+
+        ('deck', deck_id)
+        ('pages', pages_done, page_count)
+        ('questions', inserted, rejected)
+        ('done', inserted, rejected)
+        ('cancelled', inserted, rejected)
+        ('password', message)
+        ('error', message)
+
+    'deck' names the staging deck, which keeps its id once it's swapped in.
+    'password' means the PDF is encrypted and `password` was missing or
+    wrong; the GUI asks for one and starts a new worker.
+
+    If profile_path (default: $PROFILE_IMPORT) is set, the import runs
+    serially under cProfile and the stats are written there.
+    """
+
+    def __init__(self, pdf_path, deck_name=None, batch_size=IMPORT_BATCH_SIZE, password=None,
+                 profile_path=None):
+        super().__init__(daemon=True)
+        self.pdf_path = pdf_path
+        self.password = password
+        self.profile_path = profile_path or os.environ.get(PROFILE_ENV)
+        self.deck_name = deck_name or os.path.basename(pdf_path)
+        self.deck_id = None
+        self.batch_size = batch_size
+        self.messages = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._counts = (0, 0)
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def _report_pages(self, pages_done, page_count):
+        self.messages.put(('pages', pages_done, page_count))
+
+    def _report_questions(self, inserted, rejected):
+        self._counts = (inserted, rejected)
+        self.messages.put(('questions', inserted, rejected))
+
+    def _until_cancelled(self, questions):
+        for question in questions:
+            if self._cancel_event.is_set():
+                raise ImportCancelled()
+            yield question
+
+    def run(self):
+        if self.profile_path:
+            # The profiler only sees this thread, so keep extraction in it
+            with metrics.profiled(self.profile_path), metrics.span('import.total'):
+                self._import(workers=1)
+        else:
+            with metrics.span('import.total'):
+                self._import()
+        # format_summary walks every histogram, so only build it when it is logged
+        if metrics.enabled() and logger.isEnabledFor(logging.INFO):
+            logger.info("Import timings so far:\n%s", metrics.format_summary())
+
+    def _import(self, workers=None):
+        questions = iter_questions_from_pdf(self.pdf_path, workers=workers,
+                                            page_callback=self._report_pages, password=self.password)
+        try:
+            source_hash = extraction_cache.file_hash(self.pdf_path)
+            self.deck_id = begin_deck_import(self.deck_name, source_hash)
+            self.messages.put(('deck', self.deck_id))
+            inserted, rejected = add_questions(
+                self._until_cancelled(questions),
+                batch_size=self.batch_size,
+                progress_callback=self._report_questions,
+                deck_id=self.deck_id,
+            )
+            if not inserted:
+                raise ValueError(f"No questions found in {os.path.basename(self.pdf_path)}")
+            finish_deck_import(self.deck_id, self.deck_name, source_hash)
+            logger.info("Imported %d questions from %s (%d rejected)", inserted, self.pdf_path, rejected)
+            message = ('done', inserted, rejected)
+        except ImportCancelled:
+            logger.info("Import of %s cancelled", self.pdf_path)
+            message = ('cancelled',) + self._counts
+        except PasswordRequiredError as e:
+            message = ('password', str(e))
+        except Exception as e:
+            logger.error("Import of %s failed: %s", self.pdf_path, e)
+            message = ('error', str(e))
+        finally:
+            questions.close()
+        if message[0] != 'done' and self.deck_id is not None:
+            # Drop the partial import before the GUI hears of it; any earlier
+            # deck for the file is untouched
+            delete_deck(self.deck_id)
+            self.deck_id = None
+        self.messages.put(message)
@@ -1,14 +1,58 @@
+import time
+_started = time.perf_counter()
+
 import os
+import sys
+from contextlib import contextmanager
 os.environ['TK_SILENCE_DEPRECATION'] = '1'
 
-import tkinter as tk
-from database_manager import init_db
-from gui import QuestionApp
-from utils import setup_logging, log_error, log_info
+PROFILE_STARTUP_FLAG = '--profile-startup'
+# Loaded on the first PDF import, not at startup
+PDF_MODULES = ('pypdf',)
+
+_timings = []
+
+@contextmanager
+def _timed(label):
+    start = time.perf_counter()
+    yield
+    _timings.append((label, time.perf_counter() - start))
+
+with _timed('import tkinter'):
+    import tkinter as tk
+with _timed('import database_manager'):
+    from database_manager import init_db
+    from db_connection import close_all
+with _timed('import gui'):
+    from gui import QuestionApp
+with _timed('import utils'):
+    from utils import setup_logging, log_error, log_info
+
+def print_startup_report():
+    """Print where startup time went, up to the first rendered frame"""
+    print("Startup (from main.py; interpreter start-up not included):")
+    for label, seconds in _timings:
+        print(f"  {label:28} {seconds * 1000:8.1f} ms")
+    print(f"  {'first render':28} {(time.perf_counter() - _started) * 1000:8.1f} ms total")
+    loaded = [name for name in PDF_MODULES if name in sys.modules]
+    print(f"  PDF libraries loaded: {', '.join(loaded) if loaded else 'none'}")
+    print("For a per-module breakdown run: python -X importtime main.py " + PROFILE_STARTUP_FLAG)
 
 if __name__ == "__main__":
-    print("Starting application...")
-    init_db()  # This will now recreate the table with the correct structure
-    root = tk.Tk()
-    app = QuestionApp(root)
-    root.mainloop()
+    profile_startup = PROFILE_STARTUP_FLAG in sys.argv[1:]
+    with _timed('setup_logging'):
+        setup_logging()
+    log_info("Starting application...")
+    with _timed('init_db'):
+        init_db()  # Applies any pending schema migrations; existing questions are kept
+    with _timed('create window'):
+        root = tk.Tk()
+        app = QuestionApp(root)
+    if profile_startup:
+        with _timed('render'):
+            root.update()
+        print_startup_report()
+        root.destroy()
+    else:
+        root.mainloop()
+    close_all()
@@ -0,0 +1,263 @@
+import atexit
+import bisect
+import cProfile
+import functools
+import json
+import os
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# Set METRICS=1 to record spans. METRICS_FILE, if set, is written on exit;
+# a .prom suffix selects Prometheus text format, anything else JSON.
+ENV_FLAG = 'METRICS'
+ENV_FILE = 'METRICS_FILE'
+
+# Histogram buckets grow by 2**(1/4) from 1 us to about 3 minutes, so
+# quantiles read back from them are within ~10% of the true value
+BUCKET_MIN_SECONDS = 1e-6
+BUCKETS_PER_DOUBLING = 4
+BUCKET_COUNT = 28 * BUCKETS_PER_DOUBLING
+BUCKET_BOUNDS = [BUCKET_MIN_SECONDS * 2 ** (i / BUCKETS_PER_DOUBLING) for i in range(BUCKET_COUNT)]
+QUANTILES = (0.5, 0.95, 0.99)
+PROMETHEUS_METRIC = 'spaced_repetition_span_seconds'
+
+class Histogram:
+    """Running count, sum, min, max and log-bucketed distribution of durations"""
+
+    __slots__ = ('count', 'total', 'min', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        # The last bucket catches everything above the largest bound
+        self.buckets = [0] * (BUCKET_COUNT + 1)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.buckets = [mine + theirs for mine, theirs in zip(self.buckets, other.buckets)]
+
+    def quantile(self, q):
+        """Estimate the q-quantile, interpolating within its bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, in_bucket in enumerate(self.buckets):
+            if in_bucket and seen + in_bucket >= rank:
+                low = BUCKET_BOUNDS[index - 1] if index else 0.0
+                high = BUCKET_BOUNDS[index] if index < BUCKET_COUNT else self.max
+                estimate = low + (high - low) * (rank - seen) / in_bucket
+                return min(max(estimate, self.min), self.max)
+            seen += in_bucket
+        return self.max
+
+    def snapshot(self):
+        summary = {
+            'count': self.count,
+            'sum': self.total,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+            'mean': self.total / self.count if self.count else None,
+        }
+        summary.update((f'p{round(q * 100)}', self.quantile(q)) for q in QUANTILES)
+        return summary
+
+_enabled = os.environ.get(ENV_FLAG, '') not in ('', '0')
+_histograms = {}
+_lock = threading.Lock()
+
+def enabled():
+    return _enabled
+
+def enable():
+    """Start recording; pool workers started from now on record too"""
+    global _enabled
+    _enabled = True
+    # Child processes read the flag from the environment at import
+    os.environ[ENV_FLAG] = '1'
+
+def disable():
+    global _enabled
+    _enabled = False
+    os.environ.pop(ENV_FLAG, None)
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+def _histogram(name):
+    """The histogram for `name`, created on first use; the caller holds _lock"""
+    histogram = _histograms.get(name)
+    if histogram is None:
+        histogram = _histograms[name] = Histogram()
+    return histogram
+
+def take():
+    """Remove and return every histogram, e.g. to ship them out of a pool worker"""
+    global _histograms
+    with _lock:
+        histograms, _histograms = _histograms, {}
+    return histograms
+
+def merge(histograms):
+    """Fold histograms returned by take() in another process into this one's"""
+    with _lock:
+        for name, other in histograms.items():
+            _histogram(name).merge(other)
+
+def observe(name, seconds):
+    """Record one duration under `name`"""
+    with _lock:
+        _histogram(name).observe(seconds)
+
+def observe_many(name, durations):
+    """Record durations measured elsewhere, e.g. in a pool worker"""
+    if not durations:
+        return
+    with _lock:
+        histogram = _histogram(name)
+        for seconds in durations:
+            histogram.observe(seconds)
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe(self.name, perf_counter() - self.start)
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+def span(name):
+    """Context manager timing its block under `name`; a shared no-op when disabled"""
+    return _Span(name) if _enabled else _NULL_SPAN
+
+def timed(name=None):
+    """Decorator timing every call under `name` (default: the function's qualified name).
+
+    When recording is off the wrapper costs one flag check and the extra call.
+    """
+    def decorate(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(label, perf_counter() - start)
+        return wrapper
+    return decorate
+
+# --- Export ------------------------------------------------------------------
+
+def snapshot():
+    """Every span's count, sum, min, max, mean and p50/p95/p99, in seconds"""
+    with _lock:
+        return {name: histogram.snapshot() for name, histogram in sorted(_histograms.items())}
+
+def format_summary():
+    """One line per span with its count and p50/p95/p99 in milliseconds"""
+    lines = []
+    for name, stats in snapshot().items():
+        lines.append(f"{name}: n={stats['count']} p50={stats['p50'] * 1000:.3f}ms "
+                     f"p95={stats['p95'] * 1000:.3f}ms p99={stats['p99'] * 1000:.3f}ms "
+                     f"total={stats['sum']:.3f}s")
+    return '\n'.join(lines)
+
+def prometheus_text():
+    """Histograms in the Prometheus text exposition format.
+
+    Buckets are exported at every doubling (1 us, 2 us, 4 us, ...) to keep
+    the output short; counts are exact at those bounds.
+    """
+    lines = [f"# HELP {PROMETHEUS_METRIC} Time spent in instrumented spans",
+             f"# TYPE {PROMETHEUS_METRIC} histogram"]
+    with _lock:
+        histograms = sorted(_histograms.items())
+        for name, histogram in histograms:
+            label = name.replace('\\', '\\\\').replace('"', '\\"')
+            cumulative = 0
+            for index, in_bucket in enumerate(histogram.buckets[:BUCKET_COUNT]):
+                cumulative += in_bucket
+                if index % BUCKETS_PER_DOUBLING == 0:
+                    lines.append(f'{PROMETHEUS_METRIC}_bucket{{span="{label}",le="{BUCKET_BOUNDS[index]:.6g}"}} '
+                                 f'{cumulative}')
+            lines.append(f'{PROMETHEUS_METRIC}_bucket{{span="{label}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{PROMETHEUS_METRIC}_sum{{span="{label}"}} {histogram.total:.9g}')
+            lines.append(f'{PROMETHEUS_METRIC}_count{{span="{label}"}} {histogram.count}')
+    return '\n'.join(lines) + '\n'
+
+def write(path):
+    """Write every histogram to `path`: Prometheus text for .prom, JSON otherwise"""
+    content = prometheus_text() if path.endswith('.prom') else json.dumps(snapshot(), indent=2)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    logger.info("Wrote metrics to %s", path)
+
+def _write_on_exit():
+    path = os.environ.get(ENV_FILE)
+    if path and _histograms:
+        try:
+            write(path)
+        except OSError as e:
+            logger.error("Could not write metrics to %s: %s", path, e)
+
+atexit.register(_write_on_exit)
+
+# --- Profiling ---------------------------------------------------------------
+
+@contextmanager
+def profiled(path):
+    """cProfile the calling thread for the duration of the block into `path`.
+
+    Only the current thread is profiled, so run the work serially inside
+    (no process pool) to capture all of it. Read the result with pstats or
+    snakeviz.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        logger.info("Wrote profile to %s", path)
@@ -0,0 +1,508 @@
+import re
+from db_connection import get_connection
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# Each migration upgrades the schema by one version. The database's current
+# version lives in PRAGMA user_version, so a migration runs exactly once per
+# database and an up-to-date database is opened without touching any tables.
+# Migrations must never be edited once shipped; add a new one instead.
+
+def _create_questions(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS questions (
+        id INTEGER PRIMARY KEY,
+        question TEXT,
+        options TEXT,
+        correct_answer TEXT,
+        explanation TEXT
+    )
+    ''')
+    # Very old databases predate the options column
+    columns = [column[1] for column in cursor.execute("PRAGMA table_info(questions)")]
+    if 'options' not in columns:
+        cursor.execute("ALTER TABLE questions ADD COLUMN options TEXT")
+
+def _create_review_state(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS review_state (
+        question_id INTEGER PRIMARY KEY,
+        ease REAL NOT NULL DEFAULT 2.5,
+        interval REAL NOT NULL DEFAULT 0,
+        repetitions INTEGER NOT NULL DEFAULT 0,
+        lapses INTEGER NOT NULL DEFAULT 0,
+        last_review REAL,
+        next_review REAL NOT NULL DEFAULT 0
+    )
+    ''')
+    # The due queue is a range scan over this index
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_review_state_next_review ON review_state (next_review)")
+    # New questions are due immediately; deleted ones take their state with them
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS questions_review_state_insert AFTER INSERT ON questions
+    BEGIN
+        INSERT INTO review_state (question_id) VALUES (new.id);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS questions_review_state_delete AFTER DELETE ON questions
+    BEGIN
+        DELETE FROM review_state WHERE question_id = old.id;
+    END
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO review_state (question_id) SELECT id FROM questions")
+
+def _create_search_index(cursor):
+    # Full-text index over question, option and explanation text. The row id
+    # is the question id; triggers keep it in step with every write.
+    cursor.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts
+    USING fts5(question, options, explanation, tokenize = 'porter unicode61')
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS questions_fts_insert AFTER INSERT ON questions
+    BEGIN
+        INSERT INTO questions_fts (rowid, question, options, explanation)
+        VALUES (new.id, new.question,
+                (SELECT group_concat(value, ' ') FROM json_each(new.options)),
+                new.explanation);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS questions_fts_delete AFTER DELETE ON questions
+    BEGIN
+        DELETE FROM questions_fts WHERE rowid = old.id;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS questions_fts_update
+    AFTER UPDATE OF question, options, explanation ON questions
+    BEGIN
+        UPDATE questions_fts
+        SET question = new.question,
+            options = (SELECT group_concat(value, ' ') FROM json_each(new.options)),
+            explanation = new.explanation
+        WHERE rowid = new.id;
+    END
+    ''')
+    cursor.execute('''
+    INSERT INTO questions_fts (rowid, question, options, explanation)
+    SELECT id, question,
+           (SELECT group_concat(value, ' ') FROM json_each(options)),
+           explanation
+    FROM questions
+    WHERE id NOT IN (SELECT rowid FROM questions_fts)
+    ''')
+
+def _normalize_options(cursor):
+    # Options move from a JSON blob on each question to one row per option
+    cursor.execute('''
+    CREATE TABLE question_options (
+        question_id INTEGER NOT NULL,
+        letter TEXT NOT NULL,
+        text TEXT NOT NULL,
+        PRIMARY KEY (question_id, letter)
+    ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+    INSERT INTO question_options (question_id, letter, text)
+    SELECT q.id, o.key, o.value
+    FROM questions q, json_each(q.options) o
+    WHERE json_valid(q.options)
+    ''')
+
+    # The search index now takes option text from the child table
+    cursor.execute("DROP TRIGGER IF EXISTS questions_fts_insert")
+    cursor.execute("DROP TRIGGER IF EXISTS questions_fts_update")
+    cursor.execute("ALTER TABLE questions DROP COLUMN options")
+    cursor.execute('''
+    CREATE TRIGGER questions_fts_insert AFTER INSERT ON questions
+    BEGIN
+        INSERT INTO questions_fts (rowid, question, options, explanation)
+        VALUES (new.id, new.question, '', new.explanation);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER questions_fts_update AFTER UPDATE OF question, explanation ON questions
+    BEGIN
+        UPDATE questions_fts
+        SET question = new.question, explanation = new.explanation
+        WHERE rowid = new.id;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER question_options_delete_with_question AFTER DELETE ON questions
+    BEGIN
+        DELETE FROM question_options WHERE question_id = old.id;
+    END
+    ''')
+    for event, ref in (('INSERT', 'new'), ('DELETE', 'old')):
+        cursor.execute(f'''
+        CREATE TRIGGER question_options_fts_{event.lower()} AFTER {event} ON question_options
+        BEGIN
+            UPDATE questions_fts
+            SET options = (SELECT group_concat(text, ' ') FROM question_options
+                           WHERE question_id = {ref}.question_id)
+            WHERE rowid = {ref}.question_id;
+        END
+        ''')
+
+def _add_decks_and_users(cursor):
+    # Decks group imported questions; existing questions go into deck 1
+    cursor.execute('''
+    CREATE TABLE decks (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE,
+        source_hash TEXT,
+        created_at REAL NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS REAL))
+    )
+    ''')
+    cursor.execute("INSERT INTO decks (id, name) VALUES (1, 'Default')")
+    cursor.execute("ALTER TABLE questions ADD COLUMN deck_id INTEGER NOT NULL DEFAULT 1")
+    cursor.execute("CREATE INDEX idx_questions_deck ON questions (deck_id, id)")
+
+    # Existing review history belongs to user 1
+    cursor.execute('''
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE,
+        created_at REAL NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS REAL))
+    )
+    ''')
+    cursor.execute("INSERT INTO users (id, name) VALUES (1, 'default')")
+
+    # Review state becomes per (user, card). deck_id is copied onto each row
+    # so "due cards for user U in decks D1..Dn" is a pure index range scan.
+    cursor.execute('''
+    CREATE TABLE user_review_state (
+        user_id INTEGER NOT NULL,
+        question_id INTEGER NOT NULL,
+        deck_id INTEGER NOT NULL,
+        ease REAL NOT NULL DEFAULT 2.5,
+        interval REAL NOT NULL DEFAULT 0,
+        repetitions INTEGER NOT NULL DEFAULT 0,
+        lapses INTEGER NOT NULL DEFAULT 0,
+        last_review REAL,
+        next_review REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, question_id)
+    ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+    INSERT INTO user_review_state
+        (user_id, question_id, deck_id, ease, interval, repetitions, lapses, last_review, next_review)
+    SELECT 1, r.question_id, q.deck_id, r.ease, r.interval, r.repetitions, r.lapses,
+           r.last_review, r.next_review
+    FROM review_state r JOIN questions q ON q.id = r.question_id
+    ''')
+    cursor.execute("DROP TRIGGER IF EXISTS questions_review_state_insert")
+    cursor.execute("DROP TRIGGER IF EXISTS questions_review_state_delete")
+    cursor.execute("DROP TABLE review_state")
+    cursor.execute("ALTER TABLE user_review_state RENAME TO review_state")
+    cursor.execute("CREATE INDEX idx_review_state_user_due ON review_state (user_id, next_review)")
+    cursor.execute("CREATE INDEX idx_review_state_user_deck_due ON review_state (user_id, deck_id, next_review)")
+    cursor.execute("CREATE INDEX idx_review_state_question ON review_state (question_id)")
+
+    # Every user gets a state row for every card, so due queries never need
+    # an outer join against cards they haven't seen yet
+    cursor.execute('''
+    CREATE TRIGGER questions_review_state_insert AFTER INSERT ON questions
+    BEGIN
+        INSERT INTO review_state (user_id, question_id, deck_id)
+        SELECT id, new.id, new.deck_id FROM users;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER questions_review_state_delete AFTER DELETE ON questions
+    BEGIN
+        DELETE FROM review_state WHERE question_id = old.id;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER users_review_state_insert AFTER INSERT ON users
+    BEGIN
+        INSERT INTO review_state (user_id, question_id, deck_id)
+        SELECT new.id, id, deck_id FROM questions;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER users_review_state_delete AFTER DELETE ON users
+    BEGIN
+        DELETE FROM review_state WHERE user_id = old.id;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER decks_questions_delete AFTER DELETE ON decks
+    BEGIN
+        DELETE FROM questions WHERE deck_id = old.id;
+    END
+    ''')
+
+def _batch_friendly_search_triggers(cursor):
+    # Rewriting a question's search row on every option insert made bulk
+    # imports several times slower. Options are now written before their
+    # question, whose insert trigger indexes everything in one go; the option
+    # triggers only fire for options added to or removed from a question that
+    # is still there.
+    cursor.execute("DROP TRIGGER questions_fts_insert")
+    cursor.execute('''
+    CREATE TRIGGER questions_fts_insert AFTER INSERT ON questions
+    BEGIN
+        INSERT INTO questions_fts (rowid, question, options, explanation)
+        VALUES (new.id, new.question,
+                (SELECT group_concat(text, ' ') FROM question_options WHERE question_id = new.id),
+                new.explanation);
+    END
+    ''')
+    for event, ref in (('INSERT', 'new'), ('DELETE', 'old')):
+        cursor.execute(f"DROP TRIGGER question_options_fts_{event.lower()}")
+        cursor.execute(f'''
+        CREATE TRIGGER question_options_fts_{event.lower()} AFTER {event} ON question_options
+        WHEN EXISTS (SELECT 1 FROM questions WHERE id = {ref}.question_id)
+        BEGIN
+            UPDATE questions_fts
+            SET options = (SELECT group_concat(text, ' ') FROM question_options
+                           WHERE question_id = {ref}.question_id)
+            WHERE rowid = {ref}.question_id;
+        END
+        ''')
+
+def _add_progress_counters(cursor):
+    # Progress reads come from small counter tables kept current by triggers
+    # instead of COUNT(*) over questions on every card.
+    cursor.execute("ALTER TABLE questions ADD COLUMN position INTEGER NOT NULL DEFAULT 0")
+    cursor.execute('''
+    UPDATE questions SET position = numbered.position
+    FROM (SELECT id, row_number() OVER (PARTITION BY deck_id ORDER BY id) AS position
+          FROM questions) AS numbered
+    WHERE numbered.id = questions.id
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE deck_stats (
+        deck_id INTEGER PRIMARY KEY,
+        total INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    cursor.execute('''
+    INSERT INTO deck_stats (deck_id, total)
+    SELECT d.id, COUNT(q.id) FROM decks d LEFT JOIN questions q ON q.deck_id = d.id GROUP BY d.id
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE user_deck_stats (
+        user_id INTEGER NOT NULL,
+        deck_id INTEGER NOT NULL,
+        seen INTEGER NOT NULL DEFAULT 0,
+        correct INTEGER NOT NULL DEFAULT 0,
+        incorrect INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, deck_id)
+    ) WITHOUT ROWID
+    ''')
+    # Past reviews weren't logged: every lapse was a wrong answer, and the
+    # current run of correct answers is the best count of right ones we have
+    cursor.execute('''
+    INSERT INTO user_deck_stats (user_id, deck_id, seen, correct, incorrect)
+    SELECT user_id, deck_id, COUNT(*), SUM(repetitions), SUM(lapses)
+    FROM review_state WHERE last_review IS NOT NULL
+    GROUP BY user_id, deck_id
+    ''')
+
+    cursor.execute('''
+    CREATE TRIGGER decks_stats_insert AFTER INSERT ON decks
+    BEGIN
+        INSERT INTO deck_stats (deck_id) VALUES (new.id);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER decks_stats_delete AFTER DELETE ON decks
+    BEGIN
+        DELETE FROM deck_stats WHERE deck_id = old.id;
+        DELETE FROM user_deck_stats WHERE deck_id = old.id;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER users_stats_delete AFTER DELETE ON users
+    BEGIN
+        DELETE FROM user_deck_stats WHERE user_id = old.id;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER questions_stats_insert AFTER INSERT ON questions
+    BEGIN
+        UPDATE deck_stats SET total = total + 1 WHERE deck_id = new.deck_id;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER questions_stats_delete AFTER DELETE ON questions
+    BEGIN
+        UPDATE deck_stats SET total = total - 1 WHERE deck_id = old.deck_id;
+    END
+    ''')
+    # A review sets last_review; a failed one also bumps lapses (see
+    # spaced_repetition.schedule_review), so each review is counted once
+    # whether it came from record_review or the batch scheduler
+    cursor.execute('''
+    CREATE TRIGGER review_state_stats_update AFTER UPDATE OF last_review ON review_state
+    WHEN new.last_review IS NOT old.last_review
+    BEGIN
+        INSERT INTO user_deck_stats (user_id, deck_id, seen, correct, incorrect)
+        VALUES (new.user_id, new.deck_id, 1,
+                new.lapses = old.lapses, new.lapses > old.lapses)
+        ON CONFLICT (user_id, deck_id) DO UPDATE
+        SET seen = seen + (old.last_review IS NULL),
+            correct = correct + (new.lapses = old.lapses),
+            incorrect = incorrect + (new.lapses > old.lapses);
+    END
+    ''')
+
+def _add_review_log(cursor):
+    # One row per answer, never rewritten; analytics reads it incrementally by id
+    cursor.execute('''
+    CREATE TABLE reviews (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        question_id INTEGER NOT NULL,
+        deck_id INTEGER NOT NULL,
+        reviewed_at REAL NOT NULL,
+        chosen TEXT,
+        correct INTEGER NOT NULL,
+        latency_ms INTEGER
+    )
+    ''')
+    cursor.execute("CREATE INDEX idx_reviews_user ON reviews (user_id)")
+    cursor.execute('''
+    CREATE TRIGGER reviews_append_only BEFORE UPDATE ON reviews
+    BEGIN
+        SELECT RAISE(ABORT, 'reviews is append-only');
+    END
+    ''')
+
+# answer_resolver as of this migration, frozen so later resolver changes
+# don't change what migration 9 does to a fresh database
+_V9_STATEMENT = re.compile(r'''
+    (?i:\b(?:correct\s+(?:answer|option|choice)|answer)(?:\s+(?:is|was)\b|\s*:)\s*:?\s*(?:option\s+)?)
+        \(?([A-Z])\b
+  | (?i:\boption\s+)([A-Z])(?i:\s+is\s+(?:the\s+)?correct\b)
+    ''', re.VERBOSE)
+_V9_WORD = re.compile(r'[a-z0-9]+')
+_V9_MIN_COVERAGE = 0.75
+_V9_MIN_MARGIN = 0.25
+
+def _v9_normalize(text):
+    return ' '.join(_V9_WORD.findall(text.lower()))
+
+def _v9_resolve(options, correct_answer, explanation):
+    """The option letter an answer key should be, or None"""
+    if correct_answer in options:
+        return correct_answer
+    explanation = explanation or ''
+    for match in _V9_STATEMENT.finditer(explanation):
+        letter = match.group(1) or match.group(2)
+        if letter in options:
+            return letter
+    text = f' {_v9_normalize(explanation)} '
+    words = set(text.split())
+    mentions = []
+    coverage = []
+    for letter, option in options.items():
+        normalized = _v9_normalize(option)
+        if not normalized:
+            continue
+        position = text.find(f' {normalized} ')
+        if position >= 0:
+            mentions.append((position, -len(normalized), letter))
+        option_words = set(normalized.split())
+        coverage.append((len(option_words & words) / len(option_words), letter))
+    if mentions:
+        return min(mentions)[2]
+    coverage.sort(reverse=True)
+    if not coverage or coverage[0][0] < _V9_MIN_COVERAGE:
+        return None
+    if len(coverage) > 1 and coverage[0][0] - coverage[1][0] < _V9_MIN_MARGIN:
+        return None
+    return coverage[0][1]
+
+def _resolve_answer_keys(cursor):
+    # Older imports stored whatever letter followed "Answer:" (often the "E"
+    # of "Explanation"); reconcile keys that name no option, once, in bulk
+    rows = cursor.execute('''
+    SELECT q.id, q.correct_answer, q.explanation, o.letter, o.text
+    FROM questions q
+    JOIN question_options o ON o.question_id = q.id
+    WHERE NOT EXISTS (
+        SELECT 1 FROM question_options k
+        WHERE k.question_id = q.id AND k.letter = q.correct_answer
+    )
+    ORDER BY q.id
+    ''').fetchall()
+    questions = {}
+    for question_id, correct_answer, explanation, letter, text in rows:
+        question = questions.setdefault(question_id, (correct_answer, explanation, {}))
+        question[2][letter] = text
+    updates = []
+    for question_id, (correct_answer, explanation, options) in questions.items():
+        answer = _v9_resolve(options, correct_answer, explanation)
+        if answer:
+            updates.append((answer, question_id))
+    cursor.executemany("UPDATE questions SET correct_answer = ? WHERE id = ?", updates)
+    logger.info("Resolved %d of %d answer keys that matched no option", len(updates), len(questions))
+
+def _index_deck_positions(cursor):
+    # New questions are numbered after the deck's highest position
+    cursor.execute("CREATE INDEX idx_questions_deck_position ON questions (deck_id, position)")
+
+def _add_question_id_sequence(cursor):
+    # Question ids used to be MAX(id) + 1, so ids freed by a deleted deck
+    # were handed out again and the append-only reviews log attributed old
+    # answers to unrelated new cards. Ids now come from a counter that only
+    # grows, starting past every id either table has seen.
+    cursor.execute('''
+    CREATE TABLE sequences (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    )
+    ''')
+    cursor.execute('''
+    INSERT INTO sequences (name, value)
+    SELECT 'questions', MAX((SELECT COALESCE(MAX(id), 0) FROM questions),
+                            (SELECT COALESCE(MAX(question_id), 0) FROM reviews))
+    ''')
+
+MIGRATIONS = [
+    _create_questions,
+    _create_review_state,
+    _create_search_index,
+    _normalize_options,
+    _add_decks_and_users,
+    _batch_friendly_search_triggers,
+    _add_progress_counters,
+    _add_review_log,
+    _resolve_answer_keys,
+    _index_deck_positions,
+    _add_question_id_sequence,
+]
+LATEST_VERSION = len(MIGRATIONS)
+
+def get_version(conn=None):
+    conn = conn or get_connection()
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn=None):
+    """Apply every migration newer than the database's user_version.
+
+    Each migration runs in its own transaction together with the version
+    bump, so a failure leaves the database at the last good version.
+    """
+    conn = conn or get_connection()
+    version = get_version(conn)
+    if version > LATEST_VERSION:
+        raise RuntimeError(f"Database schema version {version} is newer than this app ({LATEST_VERSION})")
+    for target in range(version + 1, LATEST_VERSION + 1):
+        migration = MIGRATIONS[target - 1]
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            migration(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {target}")
+        logger.info("Migrated database to schema version %d (%s)", target, migration.__name__)
+    return LATEST_VERSION
@@ -0,0 +1,113 @@
+import sys
+import zlib
+from dataclasses import dataclass
+
+# Explanations shorter than this are kept as-is by LazyQuestion; compressing
+# them would save little or nothing
+COMPRESS_MIN_CHARS = 128
+# Joins option texts in LazyQuestion; the ASCII unit separator never occurs in
+# extracted text
+OPTION_SEPARATOR = '\x1f'
+
+@dataclass(frozen=True, slots=True)
+class Option:
+    letter: str
+    text: str
+
+class _QuestionMethods:
+    """Option accessors shared by Question and LazyQuestion.
+
+    Options are stored as a string of one-character letters, interned so
+    every question with the same choices shares one copy, plus their texts;
+    Option objects are only built when asked for.
+    """
+    __slots__ = ()
+
+    @property
+    def options(self):
+        return tuple(Option(letter, text) for letter, text
+                     in zip(self.option_letters, self._option_texts()))
+
+    @property
+    def letters(self):
+        return tuple(self.option_letters)
+
+    def option_text(self, letter, default=None):
+        for option_letter, text in zip(self.option_letters, self._option_texts()):
+            if option_letter == letter:
+                return text
+        return default
+
+    def options_dict(self):
+        return dict(zip(self.option_letters, self._option_texts()))
+
+    def to_dict(self):
+        """Plain JSON-ready form, as the extraction cache and the server use"""
+        data = {
+            'question': self.question,
+            'options': self.options_dict(),
+            'correct_answer': self.correct_answer,
+            'explanation': self.explanation,
+        }
+        if self.id is not None:
+            data['id'] = self.id
+        return data
+
+@dataclass(frozen=True, slots=True)
+class Question(_QuestionMethods):
+    """One multiple-choice question; id is None until it is stored"""
+    question: str
+    option_letters: str = ''
+    option_texts: tuple = ()
+    correct_answer: str = None
+    explanation: str = ''
+    id: int = None
+
+    @classmethod
+    def from_options(cls, question, options, correct_answer=None, explanation='', id=None):
+        """Build a Question from (letter, text) pairs"""
+        options = tuple(options)
+        return cls(question, sys.intern(''.join(letter for letter, _ in options)),
+                   tuple(text for _, text in options), correct_answer, explanation, id)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls.from_options(data['question'], data['options'].items(),
+                                data.get('correct_answer'), data.get('explanation', ''), data.get('id'))
+
+    def _option_texts(self):
+        return self.option_texts
+
+    def compact(self):
+        """The same question as a LazyQuestion, for holding many in memory"""
+        explanation = self.explanation
+        if len(explanation) >= COMPRESS_MIN_CHARS:
+            explanation = zlib.compress(explanation.encode('utf-8'))
+        return LazyQuestion(self.question, self.option_letters, OPTION_SEPARATOR.join(self.option_texts),
+                            self.correct_answer, explanation, self.id)
+
+@dataclass(frozen=True, slots=True)
+class LazyQuestion(_QuestionMethods):
+    """A Question packed for caching, decoded piecemeal on access.
+
+    Option texts are joined into one string. The explanation is the longest
+    text on a card and is only shown after the answer, so it's kept
+    zlib-compressed (unless short) and decompressed each time it's read.
+    """
+    question: str
+    option_letters: str
+    option_texts: str
+    correct_answer: str
+    explanation_data: object
+    id: int = None
+
+    def _option_texts(self):
+        return self.option_texts.split(OPTION_SEPARATOR) if self.option_letters else ()
+
+    @property
+    def explanation(self):
+        data = self.explanation_data
+        return data if isinstance(data, str) else zlib.decompress(data).decode('utf-8')
+
+    def compact(self):
+        return self
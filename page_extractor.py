@@ -0,0 +1,188 @@
+import importlib.util
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+import pypdf
+from pypdf import PasswordType, PdfReader
+from pypdf.errors import DependencyError
+import extraction_cache
+import metrics
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# Worker count used when callers don't pass one; 1 disables the process pool
+DEFAULT_WORKERS = int(os.environ.get('PDF_EXTRACT_WORKERS', os.cpu_count() or 1))
+# Small documents are faster to extract serially than to spin up a pool for
+MIN_PAGES_PER_WORKER = 8
+# Chunks per worker, so slow pages don't leave other workers idle at the end
+CHUNKS_PER_WORKER = 4
+# Either package lets pypdf decrypt AES; without one only RC4 files open
+AES_BACKENDS = ('cryptography', 'Crypto')
+AES_FILTERS = ('/AESV2', '/AESV3')
+
+class EncryptedPdfError(Exception):
+    pass
+
+class PasswordRequiredError(EncryptedPdfError):
+    """The PDF needs a password and none, or the wrong one, was given"""
+
+class CryptoBackendMissingError(EncryptedPdfError):
+    """The PDF is AES-encrypted and no AES implementation is installed"""
+
+def _uses_aes(reader):
+    encrypt = reader.trailer['/Encrypt'].get_object()
+    if encrypt.get('/V', 0) >= 5:
+        return True
+    filters = encrypt.get('/CF', {})
+    return any(crypt_filter.get_object().get('/CFM') in AES_FILTERS
+               for crypt_filter in filters.values())
+
+def _has_aes_backend():
+    return any(importlib.util.find_spec(name) for name in AES_BACKENDS)
+
+def open_reader(pdf_path, password=None):
+    """Open a PdfReader, decrypting it first if the file is encrypted.
+
+    Encrypted files are tried with `password`, or the empty user password
+    most vendor dumps use. Raises PasswordRequiredError if that fails and
+    CryptoBackendMissingError if AES is needed but unavailable.
+    """
+    with metrics.span('pdf.open'):
+        reader = PdfReader(pdf_path)
+    if not reader.is_encrypted:
+        return reader
+    if _uses_aes(reader) and not _has_aes_backend():
+        raise CryptoBackendMissingError(
+            f"{os.path.basename(pdf_path)} is AES-encrypted; install the 'cryptography' package to import it")
+    try:
+        with metrics.span('pdf.decrypt'):
+            result = reader.decrypt(password or '')
+    except DependencyError as e:
+        raise CryptoBackendMissingError(str(e)) from e
+    if result == PasswordType.NOT_DECRYPTED:
+        raise PasswordRequiredError(
+            f"{os.path.basename(pdf_path)} is encrypted; "
+            + ("the password is incorrect" if password else "a password is required"))
+    return reader
+
+def check_password(pdf_path, password=None):
+    """Raise EncryptedPdfError unless `password` (or none) opens the PDF.
+
+    Cached page text is keyed by file content alone, so this runs before
+    it's served: a cache hit must not reveal an encrypted file to someone
+    without its password. Unencrypted files always pass.
+    """
+    open_reader(pdf_path, password)
+
+def _extract_texts(pages):
+    """Yield each page's text, timing extract_text() when metrics are on"""
+    if not metrics.enabled():
+        for page in pages:
+            yield page.extract_text()
+        return
+    for page in pages:
+        with metrics.span('pdf.extract_text'):
+            text = page.extract_text()
+        yield text
+
+def _extract_range(pdf_path, start, stop, password=None):
+    """Worker entry point: open a private reader and extract pages [start, stop).
+
+    Returns the texts and the worker's metrics (None when they're off) for
+    the parent to merge.
+    """
+    reader = open_reader(pdf_path, password)
+    texts = list(_extract_texts(reader.pages[i] for i in range(start, stop)))
+    return texts, metrics.take() if metrics.enabled() else None
+
+def _page_ranges(page_count, workers):
+    chunk_size = max(MIN_PAGES_PER_WORKER // 2, -(-page_count // (workers * CHUNKS_PER_WORKER)))
+    return [(start, min(start + chunk_size, page_count))
+            for start in range(0, page_count, chunk_size)]
+
+def _iter_serial(reader, start=0):
+    yield from _extract_texts(reader.pages[start:])
+
+def _text_cache_key(pdf_path):
+    return extraction_cache.cache_key(pdf_path, {'page_text': pypdf.__version__})
+
+def iter_page_texts(pdf_path, workers=None, progress_callback=None, password=None, use_cache=True):
+    """Yield the text of every page of a PDF, in page order.
+
+    Page ranges are spread over a process pool where each worker opens its own
+    PdfReader; results come back in order as each range finishes. Falls back to
+    serial extraction for a single worker, small documents, or if the pool
+    cannot be started. progress_callback, if given, is called with
+    (pages_done, page_count) as pages are produced.
+
+    Decrypting every stream dominates the cost of encrypted PDFs, so their
+    page text is kept in the extraction cache, keyed by file content, and
+    later reads of the same file skip extracting it. The password is still
+    checked before cached text is served. Note the cached text is stored
+    unencrypted.
+    """
+    key = _text_cache_key(pdf_path) if use_cache else None
+    cached = extraction_cache.load(key) if key else None
+    if cached is not None:
+        # Only encrypted files are cached here
+        check_password(pdf_path, password)
+        logger.info("Loaded %d decrypted pages of %s from the extraction cache", len(cached), pdf_path)
+        page_count = len(cached)
+        texts = iter(cached)
+    else:
+        reader = open_reader(pdf_path, password)
+        page_count = len(reader.pages)
+        texts = _iter_pool_or_serial(pdf_path, reader, page_count, workers, password)
+        if reader.is_encrypted and key:
+            texts = _caching(texts, key, page_count)
+    if progress_callback is None:
+        yield from texts
+        return
+    progress_callback(0, page_count)
+    for pages_done, text in enumerate(texts, 1):
+        yield text
+        progress_callback(pages_done, page_count)
+
+def _caching(texts, key, page_count):
+    """Pass page texts through, storing them once every page has been read"""
+    pages = []
+    for text in texts:
+        pages.append(text)
+        yield text
+    if len(pages) == page_count:
+        extraction_cache.store(key, pages)
+
+def _iter_pool_or_serial(pdf_path, reader, page_count, workers, password=None):
+    if workers is None:
+        workers = DEFAULT_WORKERS
+    workers = min(workers, page_count // MIN_PAGES_PER_WORKER)
+
+    if workers <= 1:
+        yield from _iter_serial(reader)
+        return
+
+    ranges = _page_ranges(page_count, workers)
+    done = 0
+    try:
+        # Spawned, not forked: the GUI calls this from a worker thread, and
+        # forking a threaded process can deadlock the child on a lock
+        # another thread held
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        try:
+            starts = [start for start, _ in ranges]
+            stops = [stop for _, stop in ranges]
+            for texts, histograms in pool.map(_extract_range, repeat(pdf_path), starts, stops,
+                                              repeat(password)):
+                if histograms:
+                    metrics.merge(histograms)
+                yield from texts
+                done += len(texts)
+        finally:
+            # Don't wait for queued ranges if the consumer stopped early
+            pool.shutdown(cancel_futures=True)
+    except (OSError, BrokenProcessPool) as e:
+        logger.error("Parallel extraction failed for %s, continuing serially: %s", pdf_path, e)
+        yield from _iter_serial(reader, done)
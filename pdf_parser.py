@@ -1,111 +1,80 @@
-import PyPDF2
-import re
-import sqlite3
-import json
+import argparse
+import logging
+import os
+import sys
+import extraction_cache
+from answer_resolver import resolve_answers
+from database_manager import get_deck_id, get_deck_id_for_source
+from db_connection import transaction
+from page_extractor import iter_page_texts
+from question_parser import iter_questions
+from utils import get_logger
 
-def parse_pdf(pdf_path):
-    print(f"Attempting to parse PDF at: {pdf_path}")
-    questions = []
-    current_question = None
-    
+logger = get_logger(__name__)
+
+def parse_pdf(pdf_path, workers=None):
+    """Parse every question in a PDF, including ones without an answer line.
+
+    Questions without one have correct_answer None; update_database skips
+    them.
+    """
+    logger.info("Attempting to parse PDF at: %s", pdf_path)
     try:
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            print(f"Successfully opened PDF with {len(pdf_reader.pages)} pages")
-            
-            for page in pdf_reader.pages:
-                text = page.extract_text()
-                print(f"\nProcessing page text: {text[:100]}...")  # Print first 100 chars
-                
-                lines = text.split('\n')
-                
-                for line in lines:
-                    print(f"Processing line: {line[:50]}...")
-                    
-                    # Match "QUESTION X" or "Question X"
-                    if re.match(r'^QUESTION\s+\d+|^Question\s+\d+', line, re.IGNORECASE):
-                        if current_question:
-                            questions.append(current_question)
-                        current_question = {
-                            'question': '',
-                            'options': {},
-                            'correct_answer': None,
-                            'explanation': ''
-                        }
-                        continue
-                    
-                    # Capture the question text (lines before options)
-                    if current_question and not current_question['question'] and not line.strip().startswith(('A.', 'B.', 'C.', 'D.', 'Answer:', 'Explanation:')):
-                        current_question['question'] = line.strip()
-                    
-                    # Capture options
-                    if line.strip().startswith(('A.', 'B.', 'C.', 'D.')):
-                        option_letter = line[0]
-                        option_text = line[2:].strip()
-                        if current_question:
-                            current_question['options'][option_letter] = option_text
-                    
-                    # Capture the answer (looking specifically for "Answer: X")
-                    if line.strip().startswith('Answer:'):
-                        if current_question:
-                            answer_match = re.search(r'Answer:\s*([A-D])', line)
-                            if answer_match:
-                                current_question['correct_answer'] = answer_match.group(1)
-                    
-                    # Capture the explanation
-                    if line.strip().startswith('Explanation:'):
-                        if current_question:
-                            current_question['explanation'] = line[12:].strip()
-                    elif current_question and current_question.get('explanation'):
-                        # Append additional explanation lines
-                        current_question['explanation'] += ' ' + line.strip()
+        questions = list(iter_questions(iter_page_texts(pdf_path, workers=workers), require_answer=False))
         
-        # Add the last question
-        if current_question:
-            questions.append(current_question)
-        
-        # Debug output
-        for i, q in enumerate(questions, 1):
-            print(f"\nQuestion {i}:")
-            print(f"Question text: {q['question'][:100]}...")
-            print(f"Options: {q['options']}")
-            print(f"Correct Answer: {q['correct_answer']}")
-            print(f"Explanation: {q['explanation'][:100]}...")
+        if logger.isEnabledFor(logging.DEBUG):
+            for i, q in enumerate(questions, 1):
+                logger.debug("Question %d: %s... options=%s answer=%s explanation=%s...",
+                             i, q.question[:100], q.options_dict(), q.correct_answer,
+                             q.explanation[:100])
         
         return questions
     
     except Exception as e:
-        print(f"Error parsing PDF: {e}")
+        logger.error("Error parsing PDF %s: %s", pdf_path, e)
         return []
 
-def update_database(questions):
+def update_database(questions, deck_id):
+    """Overwrite a deck's stored answer keys, matching questions up by their text.
+
+    Not by position: the import skipped questions without a usable answer,
+    so the deck's numbering drifts from the PDF's after the first one. Pass
+    the deck the PDF was imported into; other decks are never touched.
+    Answers are resolved against the options first; questions whose answer
+    can't be resolved, or that aren't in the deck, keep their stored key.
+    All updates are written with one executemany in a single transaction.
+    """
     try:
-        conn = sqlite3.connect('questions.db')
-        cursor = conn.cursor()
-        
-        # Update existing questions with correct answers
-        for i, question in enumerate(questions, 1):
-            try:
-                cursor.execute("""
-                    UPDATE questions 
-                    SET correct_answer = ?
-                    WHERE id = ?
-                """, (question['correct_answer'], i))
-                
-                print(f"Updated question {i} with correct answer: {question['correct_answer']}")
-            except Exception as e:
-                print(f"Error updating question {i}: {e}")
-        
-        conn.commit()
-        conn.close()
-        print("Database update completed successfully")
-    
+        with transaction(immediate=True) as conn:
+            ids_by_text = {}
+            for question_id, text in conn.execute(
+                    "SELECT id, question FROM questions WHERE deck_id = ?", (deck_id,)):
+                ids_by_text.setdefault(text, []).append(question_id)
+            updates = [(question.correct_answer, question_id)
+                       for question in resolve_answers(questions)
+                       if question.correct_answer is not None
+                       for question_id in ids_by_text.get(question.question, ())]
+            conn.executemany("UPDATE questions SET correct_answer = ? WHERE id = ?", updates)
+        logger.info("Updated %d answer keys", len(updates))
     except Exception as e:
-        print(f"Database error: {e}")
+        logger.error("Database error: %s", e)
 
-def main():
-    # Update this path to your PDF file location
-    pdf_path = '/Users/pauljones/Desktop/Coding Applications/PDF App/your_pdf_file.pdf'
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Re-read answer keys from a PDF into the existing questions (use import_cli.py to import)")
+    parser.add_argument('pdf_path')
+    parser.add_argument('--deck', help="deck to update (default: the deck imported from this file)")
+    args = parser.parse_args(argv)
+    pdf_path = args.pdf_path
+    if args.deck:
+        deck_id = get_deck_id(args.deck)
+    else:
+        deck_id = get_deck_id_for_source(extraction_cache.file_hash(pdf_path))
+        if deck_id is None:
+            deck_id = get_deck_id(os.path.basename(pdf_path))
+    if deck_id is None:
+        print(f"No deck found for {pdf_path}; pass --deck NAME", file=sys.stderr)
+        return 1
     
     print("Starting PDF parsing process...")
     print(f"Using PDF path: {pdf_path}")
@@ -117,10 +86,10 @@ def main():
         print("\nFirst question sample:")
         print(questions[0])
         
-        print("\nUpdating database...")
-        update_database(questions)
+        print(f"\nUpdating deck {deck_id}...")
+        update_database(questions, deck_id)
     else:
         print("No questions found in PDF")
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,65 +1,73 @@
-import PyPDF2
-import re
-from utils import log_error, log_info
-from pypdf import PdfReader
+import extraction_cache
+from pypdf.errors import PdfReadError
+from answer_resolver import RESOLVER_VERSION, resolve_answers
+from models import Question
+from utils import get_logger
+from page_extractor import EncryptedPdfError, iter_page_texts, open_reader
+# parse_question and PARSER_VERSION are re-exported for existing callers
+from question_parser import PARSER_VERSION, iter_questions, parse_question, parser_settings
 
-def extract_questions_from_pdf(pdf_path):
-    print(f"Opening PDF file: {pdf_path}")
-    questions = []
+logger = get_logger(__name__)
+
+def _cache_settings():
+    return {**parser_settings(), 'resolver': RESOLVER_VERSION}
+
+def iter_questions_from_pdf(pdf_path, workers=None, page_callback=None, use_cache=True, password=None):
+    """Stream parsed Questions from a PDF, one page at a time.
+
+    Answer keys are reconciled with the options as questions stream past
+    (see answer_resolver). Results are cached by file content, parser and
+    resolver settings, so re-importing a
+    PDF that was already parsed skips text extraction and parsing entirely;
+    encrypted PDFs must still open with `password` first.
+    Encrypted PDFs are opened with `password`; an EncryptedPdfError is raised
+    to the caller if they can't be, so it can ask for one. Any other failure
+    is logged and re-raised too, so a corrupt file or one that breaks
+    partway through is never mistaken for a short import.
+    """
+    logger.info("Opening PDF file: %s", pdf_path)
+    count = 0
     try:
-        reader = PdfReader(pdf_path)
-        print(f"PDF has {len(reader.pages)} pages")
-        text = ''
-        for page in reader.pages:
-            text += page.extract_text()
-        
-        print(f"Extracted {len(text)} characters of text")
-        
-        # Improved question extraction
-        question_pattern = r'QUESTION\s+\d+[\s\S]*?(?=QUESTION\s+\d+|\Z)'
-        raw_questions = re.findall(question_pattern, text, re.IGNORECASE | re.DOTALL)
-        
-        for raw_question in raw_questions:
-            question_dict = parse_question(raw_question)
-            if question_dict:
-                questions.append(question_dict)
-        
-        print(f"Extracted {len(questions)} questions")
+        key = None
+        if use_cache:
+            key = extraction_cache.cache_key(pdf_path, _cache_settings())
+            cached = extraction_cache.load(key)
+            if cached is not None:
+                # The key doesn't include the password, so check it first
+                reader = open_reader(pdf_path, password)
+                if page_callback:
+                    # Nothing left to extract; show the progress as complete
+                    page_count = len(reader.pages)
+                    page_callback(page_count, page_count)
+                logger.info("Loaded %d questions from the extraction cache", len(cached))
+                yield from map(Question.from_dict, cached)
+                return
+        parsed = []
+
+        page_texts = iter_page_texts(pdf_path, workers=workers, progress_callback=page_callback,
+                                     password=password, use_cache=use_cache)
+
+        for question in resolve_answers(iter_questions(page_texts)):
+            count += 1
+            if key:
+                parsed.append(question.to_dict())
+            yield question
+
+        logger.info("Extracted %d questions", count)
+        if key:
+            extraction_cache.store(key, parsed)
+    except EncryptedPdfError as e:
+        logger.error("Cannot decrypt PDF %s: %s", pdf_path, e)
+        raise
     except FileNotFoundError:
-        log_error(f"PDF file not found: {pdf_path}")
-    except PyPDF2.errors.PdfReadError:
-        log_error(f"Error reading PDF file: {pdf_path}")
+        logger.error("PDF file not found: %s", pdf_path)
+        raise
+    except PdfReadError as e:
+        logger.error("Error reading PDF file %s: %s", pdf_path, e)
+        raise
     except Exception as e:
-        log_error(f"Unexpected error processing PDF {pdf_path}: {str(e)}")
-        print(f"Error processing PDF: {str(e)}")
-    
-    return questions
+        logger.error("Unexpected error processing PDF %s: %s", pdf_path, e)
+        raise
 
-def parse_question(raw_question):
-    # Remove the "QUESTION X" prefix
-    question_text = re.sub(r'^QUESTION\s+\d+\s*', '', raw_question, flags=re.IGNORECASE).strip()
-    
-    # Split the question into its components
-    parts = re.split(r'\nAnswer:\s*[A-Z]\s*\n', question_text, maxsplit=1)
-    if len(parts) != 2:
-        return None
-    
-    question_and_options, answer_and_explanation = parts
-    
-    # Extract options
-    options_pattern = r'([A-Z])\.\s*(.*?)(?=\n[A-Z]\.|$)'
-    options = dict(re.findall(options_pattern, question_and_options, re.DOTALL))
-    
-    # Extract the question text (everything before the first option)
-    question_text = re.split(r'\n[A-Z]\.', question_and_options)[0].strip()
-    
-    # Extract correct answer and explanation
-    correct_answer = answer_and_explanation[0]
-    explanation = answer_and_explanation[1:].strip()
-    
-    return {
-        'question': question_text,
-        'options': options,
-        'correct_answer': correct_answer,
-        'explanation': explanation
-    }
+def extract_questions_from_pdf(pdf_path, workers=None, use_cache=True, password=None):
+    return list(iter_questions_from_pdf(pdf_path, workers=workers, use_cache=use_cache, password=password))
@@ -0,0 +1,111 @@
+import threading
+from collections import OrderedDict, deque
+import metrics
+from database_manager import DEFAULT_USER_ID, get_due, get_question, get_questions
+
+DEFAULT_CACHE_SIZE = 512
+DEFAULT_PREFETCH = 10
+
+class QuestionCache:
+    """Bounded LRU cache of questions in front of database_manager.
+
+    The study loop reads through get(), and prefetch_due() loads the next few
+    due cards (and remembers their order) so advancing with next_due() is
+    served from memory. The due queue belongs to one user and, optionally, a
+    set of decks; change them with set_scope(). Call invalidate() whenever
+    questions are imported or cleared.
+
+    Entries are stored as compact LazyQuestions, whose explanation is only
+    decompressed when it's read.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, user_id=DEFAULT_USER_ID, deck_ids=None):
+        self.maxsize = maxsize
+        self.user_id = user_id
+        self.deck_ids = deck_ids
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._upcoming = deque()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, question_id):
+        return question_id in self._entries
+
+    def set_scope(self, user_id=DEFAULT_USER_ID, deck_ids=None):
+        """Study as another user or deck selection; cached questions stay valid"""
+        with self._lock:
+            self.user_id = user_id
+            self.deck_ids = deck_ids
+            self._upcoming.clear()
+
+    def _get_due(self, limit):
+        return get_due(limit, user_id=self.user_id, deck_ids=self.deck_ids)
+
+    def put(self, question):
+        question = question.compact()
+        with self._lock:
+            self._entries[question.id] = question
+            self._entries.move_to_end(question.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    @metrics.timed('cache.get_question')
+    def get(self, question_id):
+        with self._lock:
+            question = self._entries.get(question_id)
+            if question is not None:
+                self._entries.move_to_end(question_id)
+                self.hits += 1
+                return question
+            self.misses += 1
+        question = get_question(question_id)
+        if question is None:
+            return None
+        self.put(question)
+        return self._entries.get(question_id, question)
+
+    def prefetch(self, question_ids):
+        """Load any of the given ids that aren't cached yet, in one query"""
+        with self._lock:
+            missing = [qid for qid in question_ids if qid not in self._entries]
+        for question in get_questions(missing).values():
+            self.put(question)
+
+    def prefetch_sequential(self, question_id, count=DEFAULT_PREFETCH):
+        self.prefetch(range(question_id + 1, question_id + 1 + count))
+
+    def prefetch_due(self, count=DEFAULT_PREFETCH, exclude=None):
+        """Cache the next `count` due cards and queue them for next_due()"""
+        questions = [q for q in self._get_due(count + 1) if q.id != exclude][:count]
+        with self._lock:
+            self._upcoming = deque(q.id for q in questions)
+        for question in questions:
+            self.put(question)
+
+    def next_due(self, exclude=None):
+        """Id of the next due card, from the prefetched queue when possible"""
+        with self._lock:
+            while self._upcoming:
+                question_id = self._upcoming.popleft()
+                if question_id != exclude:
+                    return question_id
+        for question in self._get_due(2):
+            if question.id != exclude:
+                self.put(question)
+                return question.id
+        return None
+
+    def invalidate(self, question_id=None):
+        """Drop one cached question, or everything when no id is given"""
+        with self._lock:
+            if question_id is None:
+                self._entries.clear()
+                self._upcoming.clear()
+            else:
+                self._entries.pop(question_id, None)
+                if question_id in self._upcoming:
+                    self._upcoming.remove(question_id)
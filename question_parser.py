@@ -0,0 +1,123 @@
+import re
+import sys
+from time import perf_counter
+import metrics
+from models import Question
+
+# Bump whenever parsing changes in a way that alters the extracted questions,
+# so stale extraction cache entries are no longer hit
+PARSER_VERSION = 2
+
+# Every line is classified by a single match against this pattern; the outer
+# group that matched (Match.lastindex) says what kind of line it is. Plain
+# text lines don't match at all.
+LINE_PATTERN = re.compile(r'''
+    [ \t]*(?:
+        ((?i:question)\s+\d+\b[\s:.]*(.*))
+      | (Answer:\s*([A-Z])\b[\s.,)]*(?:Explanation:\s*)?(.*))
+      | (Explanation:\s*(.*))
+      | (([A-Z])\.\s*(.*))
+    )''', re.VERBOSE)
+HEADER_LINE, ANSWER_LINE, EXPLANATION_LINE, OPTION_LINE = 1, 3, 6, 8
+
+# Parser states
+QUESTION, OPTIONS, EXPLANATION = range(3)
+
+def _join(lines):
+    return lines[0].strip() if len(lines) == 1 else '\n'.join(lines).strip()
+
+def _build(question, options, correct_answer, explanation):
+    return Question(
+        _join(question),
+        sys.intern(''.join(options)),
+        tuple([_join(lines) for lines in options.values()]),
+        correct_answer,
+        _join(explanation),
+    )
+
+def iter_questions(page_texts, require_answer=True):
+    """Parse Questions from an iterable of page texts in a single pass.
+
+    Each line is matched once against LINE_PATTERN and drives a small state
+    machine: question text, then options, then the answer and explanation.
+    Lines that don't start a new part continue whichever part is current, so
+    stems, options and explanations may wrap. Option-like lines after the
+    answer (e.g. "E.g. ...") stay in the explanation. A question is yielded
+    as soon as the next "QUESTION N" header is seen, and a page break always
+    ends a line.
+
+    Questions without an "Answer:" line are skipped, or yielded with
+    correct_answer None when require_answer is False.
+
+    With metrics on, the time spent parsing each question is recorded as
+    parse.question; waiting for page text and time suspended at a yield are
+    left out, so the figure is the parser's own.
+    """
+    match_line = LINE_PATTERN.match
+    timing = metrics.enabled()
+    # Parse time so far for the current question; a skipped question's
+    # time goes to the next one
+    parse_seconds = 0.0
+    started = False
+    question = options = explanation = current = None
+    correct_answer = None
+    state = QUESTION
+    for page_text in page_texts:
+        if not page_text:
+            continue
+        if timing:
+            resumed = perf_counter()
+        for line in page_text.split('\n'):
+            match = match_line(line)
+            kind = match.lastindex if match else None
+            if kind == HEADER_LINE:
+                if started and (correct_answer is not None or not require_answer):
+                    built = _build(question, options, correct_answer, explanation)
+                    if timing:
+                        metrics.observe('parse.question', parse_seconds + perf_counter() - resumed)
+                        parse_seconds = 0.0
+                    yield built
+                    if timing:
+                        resumed = perf_counter()
+                started = True
+                rest = match.group(2)
+                question = current = [rest] if rest else []
+                options = {}
+                explanation = []
+                correct_answer = None
+                state = QUESTION
+            elif not started:
+                # Preamble before the first question
+                continue
+            elif kind == OPTION_LINE and state != EXPLANATION:
+                current = options[match.group(9)] = [match.group(10)]
+                state = OPTIONS
+            elif kind == ANSWER_LINE and state != EXPLANATION:
+                correct_answer = match.group(4)
+                current = explanation
+                if match.group(5):
+                    explanation.append(match.group(5))
+                state = EXPLANATION
+            elif kind == EXPLANATION_LINE and state == EXPLANATION and not explanation:
+                explanation.append(match.group(7))
+            else:
+                current.append(line)
+        if timing:
+            parse_seconds += perf_counter() - resumed
+    if started and (correct_answer is not None or not require_answer):
+        if timing:
+            resumed = perf_counter()
+        built = _build(question, options, correct_answer, explanation)
+        if timing:
+            metrics.observe('parse.question', parse_seconds + perf_counter() - resumed)
+        yield built
+
+def parse_question(raw_question, require_answer=True):
+    """Parse one "QUESTION N ..." block, or return None if it has no answer"""
+    for question in iter_questions([raw_question], require_answer=require_answer):
+        return question
+    return None
+
+def parser_settings():
+    """Everything that affects parse output, used to key the extraction cache"""
+    return {'version': PARSER_VERSION, 'pattern': LINE_PATTERN.pattern}
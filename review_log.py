@@ -0,0 +1,77 @@
+import threading
+import time
+from database_manager import DEFAULT_USER_ID
+from db_connection import transaction
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_FLUSH_SIZE = 50
+DEFAULT_FLUSH_INTERVAL = 30.0
+
+# The deck is looked up from the question as each row is written, so callers
+# only need to know the card
+INSERT_REVIEW_SQL = '''
+    INSERT INTO reviews (user_id, question_id, deck_id, reviewed_at, chosen, correct, latency_ms)
+    SELECT ?, id, deck_id, ?, ?, ?, ? FROM questions WHERE id = ?
+    '''
+
+class ReviewLogger:
+    """Buffers answers and appends them to the reviews table in batches.
+
+    log() only appends to an in-memory list. The buffer is written with one
+    executemany once it holds flush_size answers or its oldest answer is
+    flush_interval seconds old; call flush() (or close()) before exiting so
+    nothing buffered is lost.
+    """
+
+    def __init__(self, flush_size=DEFAULT_FLUSH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._oldest = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def log(self, question_id, chosen, correct, latency_ms=None,
+            user_id=DEFAULT_USER_ID, reviewed_at=None):
+        if reviewed_at is None:
+            reviewed_at = time.time()
+        with self._lock:
+            self._pending.append((user_id, reviewed_at, chosen, int(bool(correct)),
+                                  None if latency_ms is None else int(latency_ms), question_id))
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            due = (len(self._pending) >= self.flush_size
+                   or time.monotonic() - self._oldest >= self.flush_interval)
+        if due:
+            try:
+                self.flush()
+            except Exception:
+                # flush() kept the batch and logged the error; the answer is
+                # buffered either way, so the caller's write stands
+                pass
+
+    def flush(self):
+        """Write every buffered answer in a single transaction"""
+        with self._lock:
+            rows, self._pending = self._pending, []
+            self._oldest = None
+        if not rows:
+            return 0
+        try:
+            with transaction() as conn:
+                conn.executemany(INSERT_REVIEW_SQL, rows)
+        except Exception:
+            # Keep the answers for the next attempt rather than dropping them
+            with self._lock:
+                self._pending[:0] = rows
+                self._oldest = self._oldest or time.monotonic()
+            logger.exception("Could not write %d reviews", len(rows))
+            raise
+        logger.debug("Logged %d reviews", len(rows))
+        return len(rows)
+
+    close = flush
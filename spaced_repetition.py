@@ -12,3 +12,56 @@ def calculate_next_review(difficulty):
         return today + timedelta(days=14)
     else:
         return today + timedelta(days=30)
+
+# SM-2 scheduling. Review quality runs from 0 (complete blackout) to 5
+# (perfect recall); anything below 3 counts as a lapse.
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+PASSING_QUALITY = 3
+QUALITY_CORRECT = 4
+QUALITY_INCORRECT = 1
+SECONDS_PER_DAY = 86400
+
+def new_review_state():
+    return {
+        'ease': DEFAULT_EASE,
+        'interval': 0,
+        'repetitions': 0,
+        'lapses': 0,
+        'last_review': None,
+        'next_review': 0,
+    }
+
+def sm2(ease, interval, repetitions, quality):
+    """Apply one SM-2 review step, returning (ease, interval_days, repetitions)"""
+    if quality < PASSING_QUALITY:
+        repetitions = 0
+        interval = 1
+    else:
+        if repetitions == 0:
+            interval = 1
+        elif repetitions == 1:
+            interval = 6
+        else:
+            interval = max(1, round(interval * ease))
+        repetitions += 1
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    return ease, interval, repetitions
+
+def schedule_review(state, quality, now=None):
+    """Return the card state after a review of the given quality.
+
+    Times are Unix timestamps; `interval` is in days.
+    """
+    if now is None:
+        now = datetime.now().timestamp()
+    ease, interval, repetitions = sm2(state['ease'], state['interval'], state['repetitions'], quality)
+    lapses = state['lapses'] + (1 if quality < PASSING_QUALITY else 0)
+    return {
+        'ease': ease,
+        'interval': interval,
+        'repetitions': repetitions,
+        'lapses': lapses,
+        'last_review': now,
+        'next_review': now + interval * SECONDS_PER_DAY,
+    }
@@ -0,0 +1,358 @@
+import argparse
+import asyncio
+import hmac
+import ipaddress
+import json
+import math
+import os
+import sqlite3
+from urllib.parse import parse_qs, unquote
+from pypdf.errors import PdfReadError
+from database_manager import DEFAULT_USER_ID, init_db
+from page_extractor import CryptoBackendMissingError, PasswordRequiredError
+from spaced_repetition_app import database
+from spaced_repetition_app.pdf_processor import import_pdf
+from spaced_repetition_app.spaced_repetition import grade_answer
+from utils import get_logger, setup_logging
+
+logger = get_logger(__name__)
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGES = {
+    '/': ('templates/index.html', 'text/html; charset=utf-8'),
+    '/review': ('templates/review.html', 'text/html; charset=utf-8'),
+    '/static/style.css': ('static/style.css', 'text/css; charset=utf-8'),
+}
+DEFAULT_DUE_LIMIT = 10
+MAX_DUE_LIMIT = 100
+MAX_REQUEST_BYTES = int(os.environ.get('STUDY_MAX_REQUEST_BYTES', 200 * 1024 * 1024))
+# The built-in server hands request bodies to the app in pieces of this size
+BODY_CHUNK_BYTES = 64 * 1024
+# Imports write to the shared database, so they need this bearer token, or
+# come from the local machine when no token is configured
+IMPORT_TOKEN = os.environ.get('STUDY_IMPORT_TOKEN')
+AUTHENTICATED_ROUTES = {('POST', '/api/import')}
+DEFAULT_DECK_NAME = 'upload.pdf'
+PASSWORD_HEADER = b'x-pdf-password'
+REASONS = {200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found', 405: 'Method Not Allowed',
+           409: 'Conflict', 413: 'Payload Too Large', 422: 'Unprocessable Content',
+           500: 'Internal Server Error', 501: 'Not Implemented'}
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+# --- Request handlers -------------------------------------------------------
+
+def _int_param(query, name, default, maximum=None, minimum=None):
+    try:
+        value = int(query.get(name, [default])[0])
+    except ValueError:
+        raise HTTPError(400, f"'{name}' must be an integer")
+    # SQLite treats a negative LIMIT as no limit at all
+    if minimum is not None and value < minimum:
+        raise HTTPError(400, f"'{name}' must be at least {minimum}")
+    return min(value, maximum) if maximum else value
+
+def _deck_ids(query):
+    """Repeated ?deck=<id> parameters; None (every deck) when absent"""
+    if 'deck' not in query:
+        return None
+    try:
+        return [int(value) for value in query['deck']]
+    except ValueError:
+        raise HTTPError(400, "'deck' must be an integer")
+
+def _json_body(body):
+    try:
+        data = json.loads(body or b'{}')
+    except ValueError:
+        raise HTTPError(400, "Request body must be JSON")
+    if not isinstance(data, dict):
+        raise HTTPError(400, "Request body must be a JSON object")
+    return data
+
+async def due(query, body, headers):
+    limit = _int_param(query, 'limit', DEFAULT_DUE_LIMIT, MAX_DUE_LIMIT, minimum=1)
+    user_id = _int_param(query, 'user', DEFAULT_USER_ID)
+    questions = await database.get_due(limit, user_id, _deck_ids(query))
+    # Answers stay on the server until the learner submits
+    return {'questions': [{'id': q.id, 'question': q.question, 'options': q.options_dict()}
+                          for q in questions]}
+
+async def answer(query, body, headers):
+    data = _json_body(body)
+    try:
+        question_id = int(data['question_id'])
+        chosen = str(data['answer'])
+        user_id = int(data.get('user_id', DEFAULT_USER_ID))
+        latency_ms = data.get('latency_ms')
+        latency_ms = None if latency_ms is None else float(latency_ms)
+    except (KeyError, TypeError, ValueError):
+        raise HTTPError(400, "Expected {'question_id': int, 'answer': str, 'user_id': int, 'latency_ms': number}")
+    # json.loads accepts NaN and Infinity; check before anything is written
+    if latency_ms is not None and not (math.isfinite(latency_ms) and latency_ms >= 0):
+        raise HTTPError(400, "'latency_ms' must be a non-negative number")
+    question = await database.get_question(question_id)
+    if question is None:
+        raise HTTPError(404, f"No question {question_id}")
+    correct, quality = grade_answer(question, chosen)
+    # The schedule is updated first; logging the answer afterwards only
+    # buffers it, so it cannot fail and leave a retry to count it twice
+    state = await database.record_review(question_id, quality, user_id)
+    if state is None:
+        raise HTTPError(404, f"No review state for question {question_id} and user {user_id}")
+    await database.log_review(question_id, chosen, correct, latency_ms, user_id)
+    return {
+        'correct': correct,
+        'correct_answer': question.correct_answer,
+        'explanation': question.explanation,
+        'next_review': state['next_review'],
+    }
+
+async def import_questions(query, body, headers):
+    if not body:
+        raise HTTPError(400, "Send the PDF file as the request body")
+    deck_name = query.get('name', [DEFAULT_DECK_NAME])[0]
+    # A header rather than the query string, which ends up in access logs and
+    # browser history; percent-encoded since header values are Latin-1
+    password = headers.get(PASSWORD_HEADER)
+    password = unquote(password.decode('latin-1')) if password else None
+    try:
+        deck_id, inserted, rejected = await import_pdf(body, deck_name, password)
+    except PasswordRequiredError as e:
+        raise HTTPError(401, str(e))
+    except CryptoBackendMissingError as e:
+        raise HTTPError(501, str(e))
+    except (PdfReadError, ValueError) as e:
+        # Not a readable PDF, or no valid questions in it
+        raise HTTPError(422, str(e))
+    return {'deck_id': deck_id, 'inserted': inserted, 'rejected': rejected}
+
+async def stats(query, body, headers):
+    user_id = _int_param(query, 'user', DEFAULT_USER_ID)
+    return await database.get_stats(user_id, _deck_ids(query))
+
+async def analytics(query, body, headers):
+    user_id = _int_param(query, 'user', DEFAULT_USER_ID)
+    limit = _int_param(query, 'limit', 10, MAX_DUE_LIMIT, minimum=1)
+    return await database.get_analytics(user_id, limit)
+
+async def decks(query, body, headers):
+    return {'decks': await database.list_decks()}
+
+async def create_user(query, body, headers):
+    name = _json_body(body).get('name')
+    if not isinstance(name, str) or not name.strip():
+        raise HTTPError(400, "Expected {'name': str}")
+    try:
+        user_id = await database.add_user(name.strip())
+    except sqlite3.IntegrityError:
+        raise HTTPError(409, f"User {name!r} already exists")
+    return {'id': user_id, 'name': name.strip()}
+
+async def search(query, body, headers):
+    text = query.get('q', [''])[0]
+    limit = _int_param(query, 'limit', 20, MAX_DUE_LIMIT, minimum=1)
+    return {'results': await database.search(text, limit)}
+
+ROUTES = {
+    ('GET', '/api/due'): due,
+    ('POST', '/api/answer'): answer,
+    ('POST', '/api/import'): import_questions,
+    ('GET', '/api/stats'): stats,
+    ('GET', '/api/search'): search,
+    ('GET', '/api/decks'): decks,
+    ('GET', '/api/analytics'): analytics,
+    ('POST', '/api/users'): create_user,
+}
+
+def _read_page(path):
+    with open(os.path.join(APP_DIR, path), 'rb') as f:
+        return f.read()
+
+# --- ASGI application -------------------------------------------------------
+
+async def _read_body(receive, max_bytes=None):
+    """Collect the request body, raising 413 as soon as it passes max_bytes"""
+    max_bytes = MAX_REQUEST_BYTES if max_bytes is None else max_bytes
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPError(413, f"Request body is larger than {max_bytes} bytes")
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+def _is_loopback(client):
+    try:
+        return client is not None and ipaddress.ip_address(client[0]).is_loopback
+    except ValueError:
+        return False
+
+def _authorize(scope, headers):
+    """Raise 401 unless the request carries the import token (or, without one, is local)"""
+    if IMPORT_TOKEN is None:
+        if not _is_loopback(scope.get('client')):
+            raise HTTPError(401, "Imports are only accepted locally unless the server has an import token")
+        return
+    scheme, _, token = headers.get(b'authorization', b'').partition(b' ')
+    if scheme.lower() != b'bearer' or not hmac.compare_digest(token.strip(), IMPORT_TOKEN.encode()):
+        raise HTTPError(401, "A valid 'Authorization: Bearer <token>' header is required to import")
+
+async def _respond(send, status, content_type, payload):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type.encode()),
+                    (b'content-length', str(len(payload)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+async def app(scope, receive, send):
+    """ASGI entry point; also runs under any ASGI server (e.g. uvicorn)"""
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await database.run_db(init_db)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                database.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    method = scope['method']
+    path = scope['path']
+    query = parse_qs(scope.get('query_string', b'').decode())
+    headers = dict(scope.get('headers', ()))
+
+    try:
+        if (method, path) in AUTHENTICATED_ROUTES:
+            # Before reading the body, so unauthorized uploads aren't buffered
+            _authorize(scope, headers)
+        body = await _read_body(receive)
+        if path in PAGES:
+            if method != 'GET':
+                raise HTTPError(405, f"{method} not allowed on {path}")
+            page, content_type = PAGES[path]
+            await _respond(send, 200, content_type, _read_page(page))
+            return
+        handler = ROUTES.get((method, path))
+        if handler is None:
+            if any(route_path == path for _, route_path in ROUTES):
+                raise HTTPError(405, f"{method} not allowed on {path}")
+            raise HTTPError(404, f"No route for {path}")
+        result = await handler(query, body, headers)
+        status = 200
+    except HTTPError as e:
+        result = {'error': e.message}
+        status = e.status
+    except Exception as e:
+        logger.exception("Error handling %s %s", method, path)
+        result = {'error': str(e)}
+        status = 500
+    await _respond(send, status, 'application/json', json.dumps(result).encode())
+
+# --- Minimal stdlib HTTP/1.1 server for local use ---------------------------
+
+async def _handle_connection(reader, writer):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line.strip():
+                break
+            method, target, version = request_line.decode('latin-1').split()
+            headers = []
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers.append((name.strip().lower().encode(), value.strip().encode()))
+            header_map = dict(headers)
+            length = int(header_map.get(b'content-length', 0))
+            if length > MAX_REQUEST_BYTES:
+                writer.write(b'HTTP/1.1 413 Payload Too Large\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                break
+
+            path, _, query_string = target.partition('?')
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': version[5:],
+                'method': method, 'path': unquote(path), 'query_string': query_string.encode(),
+                'headers': headers, 'client': writer.get_extra_info('peername')[:2],
+            }
+            keep_alive = header_map.get(b'connection', b'').lower() != b'close' and version == 'HTTP/1.1'
+            response = {}
+            remaining = length
+
+            async def receive():
+                # Read the body only as the app asks for it, so a request
+                # rejected on its headers (e.g. 401) is never buffered
+                nonlocal remaining
+                chunk = await reader.readexactly(min(remaining, BODY_CHUNK_BYTES)) if remaining else b''
+                remaining -= len(chunk)
+                return {'type': 'http.request', 'body': chunk, 'more_body': remaining > 0}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    response['status'] = message['status']
+                    response['headers'] = message['headers']
+                else:
+                    response['body'] = response.get('body', b'') + message.get('body', b'')
+
+            await app(scope, receive, send)
+            if remaining:
+                # The unread body would be parsed as the next request
+                keep_alive = False
+            status = response['status']
+            head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+            head += [f"{name.decode()}: {value.decode()}" for name, value in response['headers']]
+            head.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+            writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + response.get('body', b''))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+async def serve(host='127.0.0.1', port=8000):
+    await database.run_db(init_db)
+    server = await asyncio.start_server(_handle_connection, host, port)
+    logger.info("Study server listening on http://%s:%d", host, port)
+    print(f"Study server listening on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        database.shutdown()
+
+def main():
+    global IMPORT_TOKEN, MAX_REQUEST_BYTES
+    parser = argparse.ArgumentParser(description="Serve the study app over HTTP/JSON")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--import-token', default=IMPORT_TOKEN,
+                        help="bearer token required for /api/import (default: $STUDY_IMPORT_TOKEN; "
+                             "without one only local clients may import)")
+    parser.add_argument('--max-request-bytes', type=int, default=MAX_REQUEST_BYTES,
+                        help="largest accepted request body (default: $STUDY_MAX_REQUEST_BYTES or 200 MiB)")
+    args = parser.parse_args()
+    IMPORT_TOKEN = args.import_token
+    MAX_REQUEST_BYTES = args.max_request_bytes
+    setup_logging()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import database_manager
+from analytics import ReviewAnalytics
+from review_log import ReviewLogger
+
+# Every worker thread keeps its own pooled SQLite connection (see
+# db_connection), so the executor size is also the connection pool size.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+
+_executor = None
+_review_logger = ReviewLogger()
+# One incremental analytics engine per user, refreshed under a lock
+_analytics = {}
+_analytics_lock = threading.Lock()
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix='db')
+    return _executor
+
+async def run_db(func, *args):
+    """Run a blocking database_manager call on the connection pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), func, *args)
+
+def shutdown():
+    global _executor
+    _review_logger.flush()
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+async def get_due(limit, user_id, deck_ids=None):
+    return await run_db(database_manager.get_due, limit, None, user_id, deck_ids)
+
+async def get_question(question_id):
+    return await run_db(database_manager.get_question, question_id)
+
+async def record_review(question_id, quality, user_id):
+    return await run_db(database_manager.record_review, question_id, quality, None, user_id)
+
+async def log_review(question_id, chosen, correct, latency_ms, user_id):
+    # Usually just a buffer append; every flush_size-th answer writes the batch
+    return await run_db(_review_logger.log, question_id, chosen, correct, latency_ms, user_id)
+
+def _analytics_report(user_id, limit):
+    with _analytics_lock:
+        engine = _analytics.setdefault(user_id, ReviewAnalytics(user_id))
+        _review_logger.flush()
+        return engine.report(limit)
+
+async def get_analytics(user_id, limit):
+    return await run_db(_analytics_report, user_id, limit)
+
+async def search(query, limit):
+    return await run_db(database_manager.search, query, limit)
+
+async def get_stats(user_id, deck_ids=None):
+    return await run_db(database_manager.get_progress, user_id, deck_ids)
+
+async def list_decks():
+    return await run_db(database_manager.list_decks)
+
+async def add_user(name):
+    return await run_db(database_manager.add_user, name)
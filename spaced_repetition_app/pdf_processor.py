@@ -0,0 +1,29 @@
+import os
+import tempfile
+import extraction_cache
+from database_manager import import_deck
+from pdf_processor import iter_questions_from_pdf
+from spaced_repetition_app.database import run_db
+
+def _import_pdf_bytes(data, deck_name, password):
+    # pypdf and the extraction cache work from a path, so spool to disk first
+    fd, path = tempfile.mkstemp(suffix='.pdf')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        # The request already runs on a pool thread; don't fork a process pool too
+        questions = list(iter_questions_from_pdf(path, workers=1, password=password))
+        # Parsed in full before the single-transaction replace, so a failed
+        # or empty import leaves any existing deck alone. Re-uploading the
+        # same file replaces its deck; a different file under the same name
+        # gets a deck of its own.
+        return import_deck(deck_name, questions, extraction_cache.file_hash(path))
+    finally:
+        os.remove(path)
+
+async def import_pdf(data, deck_name, password=None):
+    """Import an uploaded PDF into the named deck, returning (deck_id, inserted, rejected).
+
+    Raises ValueError if it holds no valid questions.
+    """
+    return await run_db(_import_pdf_bytes, data, deck_name, password)
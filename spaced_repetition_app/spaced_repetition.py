@@ -0,0 +1,6 @@
+from spaced_repetition import QUALITY_CORRECT, QUALITY_INCORRECT
+
+def grade_answer(question, answer):
+    """Return (correct, review quality) for an answer to a Question"""
+    correct = answer == question.correct_answer
+    return correct, QUALITY_CORRECT if correct else QUALITY_INCORRECT
@@ -1,12 +1,64 @@
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
 
-def setup_logging():
-    logging.basicConfig(filename='app.log', level=logging.INFO,
-                        format='%(asctime)s - %(levelname)s - %(message)s')
+LOG_FILE = 'app.log'
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(name)s - %(message)s'
+# app.log rolls over to app.log.1 ... app.log.N once it reaches this size
+MAX_LOG_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 3
+
+_listener = None
+
+def setup_logging(level=None, log_file=LOG_FILE, max_bytes=MAX_LOG_BYTES,
+                  backup_count=LOG_BACKUP_COUNT, console=False):
+    """Route all logging through a queue to a size-rotated log file.
+
+    Callers only pay for putting a record on an in-memory queue; a
+    QueueListener thread does the file (and optional console) writes. The
+    level defaults to the LOG_LEVEL environment variable, or INFO. Calling
+    this again after logging is set up is a no-op.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    if level is None:
+        level = os.environ.get('LOG_LEVEL', 'INFO').upper()
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = []
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+    file_handler.setFormatter(formatter)
+    handlers.append(file_handler)
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+        handlers.append(console_handler)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def get_logger(name):
+    return logging.getLogger(name)
 
 def log_error(error_message):
     logging.error(error_message)
 
 def log_info(info_message):
     logging.info(info_message)
-